@@ -0,0 +1,238 @@
+import asyncio
+import json
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app.database import SessionLocal
+from app.models import AnalysisJob
+
+# --- Background analysis queue (jobs persisted in analysis_jobs) ---
+
+# Concurrent analyses per server process
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))
+
+# Reject new submissions once this many jobs are waiting (backpressure)
+ANALYSIS_QUEUE_MAX = int(os.getenv("ANALYSIS_QUEUE_MAX", 100))
+
+# A worker gives up on a job after this long
+ANALYSIS_JOB_TIMEOUT_SECONDS = int(os.getenv("ANALYSIS_JOB_TIMEOUT_SECONDS", 300))
+
+# A 'running' job older than this is assumed orphaned (crashed worker) and re-claimed.
+# Always longer than the timeout, so a live worker gets to record its own outcome first.
+ANALYSIS_JOB_STALE_SECONDS = max(
+    int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", ANALYSIS_JOB_TIMEOUT_SECONDS + 120)),
+    ANALYSIS_JOB_TIMEOUT_SECONDS + 30,
+)
+
+# A job that has been claimed this many times without finishing is marked failed
+ANALYSIS_JOB_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_JOB_MAX_ATTEMPTS", 3))
+
+# Finished jobs (and their uploaded files) are deleted after this long
+ANALYSIS_JOB_RETENTION_HOURS = int(os.getenv("ANALYSIS_JOB_RETENTION_HOURS", 24))
+
+# How often idle workers check the table for jobs submitted by other processes
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", 2.0))
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at ANALYSIS_QUEUE_MAX."""
+
+
+_wakeup = None
+_workers = []
+
+
+def _wake_workers():
+    if _wakeup is not None:
+        _wakeup.set()
+
+# === Queue operations (sync; run via asyncio.to_thread from async code) ===
+
+def enqueue_job(job_description, user_id=None, resume_id=None, resume_filename=None, resume_data=None):
+    """Persist a new queued job and return its public job_id."""
+    db = SessionLocal()
+    try:
+        queued = db.query(AnalysisJob).filter(AnalysisJob.status == "queued").count()
+        if queued >= ANALYSIS_QUEUE_MAX:
+            raise QueueFullError()
+
+        job = AnalysisJob(
+            job_id=secrets.token_urlsafe(24),
+            user_id=user_id,
+            status="queued",
+            job_description=job_description,
+            resume_id=resume_id,
+            resume_filename=resume_filename,
+            resume_data=resume_data,
+        )
+        db.add(job)
+        db.commit()
+        return job.job_id
+    finally:
+        db.close()
+
+def get_job(job_id):
+    """Return a detached AnalysisJob by public id, or None."""
+    db = SessionLocal()
+    try:
+        job = db.query(AnalysisJob).filter(AnalysisJob.job_id == job_id).first()
+        if job is not None:
+            db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+def queue_depth():
+    """Number of jobs waiting to start."""
+    db = SessionLocal()
+    try:
+        return db.query(AnalysisJob).filter(AnalysisJob.status == "queued").count()
+    finally:
+        db.close()
+
+def _claim_next_job():
+    """
+    Atomically take the oldest runnable job, mark it running and give it a fresh
+    claim_token. SKIP LOCKED lets several server processes share the table without
+    handing the same job out twice (ignored on databases without it).
+    Orphaned jobs already claimed ANALYSIS_JOB_MAX_ATTEMPTS times are failed instead.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            stale = datetime.utcnow() - timedelta(seconds=ANALYSIS_JOB_STALE_SECONDS)
+            job = (
+                db.query(AnalysisJob)
+                .filter(or_(
+                    AnalysisJob.status == "queued",
+                    (AnalysisJob.status == "running") & (AnalysisJob.started_at < stale),
+                ))
+                .order_by(AnalysisJob.created_at.asc())
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.rollback()
+                return None
+            if job.attempts >= ANALYSIS_JOB_MAX_ATTEMPTS:
+                # Keeps crashing or hanging its worker; stop re-queueing it
+                job.status = "failed"
+                job.error = f"Analysis did not finish after {job.attempts} attempts."
+                job.finished_at = datetime.utcnow()
+                job.claim_token = None
+                job.resume_data = None
+                db.commit()
+                continue
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            job.claim_token = secrets.token_hex(16)
+            job.attempts += 1
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+            return job
+    finally:
+        db.close()
+
+def _finish_job(job, result=None, error=None):
+    """
+    Record the outcome of a claimed job. Ignored if the job has since been
+    re-claimed by another worker (its claim_token changed) or already finished.
+    """
+    db = SessionLocal()
+    try:
+        updated = db.query(AnalysisJob).filter(
+            AnalysisJob.job_id == job.job_id,
+            AnalysisJob.status == "running",
+            AnalysisJob.claim_token == job.claim_token,
+        ).update({
+            AnalysisJob.status: "failed" if error else "succeeded",
+            AnalysisJob.result: json.dumps(result) if result is not None else None,
+            AnalysisJob.error: error,
+            AnalysisJob.finished_at: datetime.utcnow(),
+            AnalysisJob.claim_token: None,
+            # The uploaded file is no longer needed once the job is done
+            AnalysisJob.resume_data: None,
+        }, synchronize_session=False)
+        db.commit()
+        if not updated:
+            print(f"Analysis job {job.job_id} was re-claimed; dropping this worker's outcome")
+    finally:
+        db.close()
+
+def purge_finished_jobs():
+    """Delete finished jobs older than ANALYSIS_JOB_RETENTION_HOURS."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(hours=ANALYSIS_JOB_RETENTION_HOURS)
+        db.query(AnalysisJob).filter(
+            AnalysisJob.status.in_(["succeeded", "failed"]),
+            AnalysisJob.finished_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+# === Worker pool ===
+
+async def _worker_loop(run_job):
+    while True:
+        try:
+            job = await asyncio.to_thread(_claim_next_job)
+        except Exception as e:
+            print("Analysis worker could not claim a job:", e)
+            job = None
+
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=ANALYSIS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            result = await asyncio.wait_for(run_job(job), timeout=ANALYSIS_JOB_TIMEOUT_SECONDS)
+            await asyncio.to_thread(_finish_job, job, result=result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            message = str(e) or e.__class__.__name__
+            await asyncio.to_thread(_finish_job, job, error=message)
+
+async def _janitor_loop():
+    while True:
+        try:
+            await asyncio.to_thread(purge_finished_jobs)
+        except Exception as e:
+            print("Analysis job cleanup failed:", e)
+        await asyncio.sleep(3600)
+
+def start_workers(run_job):
+    """
+    Start ANALYSIS_WORKERS worker tasks on the running event loop.
+    `run_job` is an async callable taking an AnalysisJob and returning the result dict.
+    """
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for _ in range(ANALYSIS_WORKERS):
+        _workers.append(asyncio.create_task(_worker_loop(run_job)))
+    _workers.append(asyncio.create_task(_janitor_loop()))
+
+async def stop_workers():
+    """Cancel the worker tasks (running jobs are re-claimed once they go stale)."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+async def submit_job(**kwargs):
+    """Enqueue a job and wake an idle worker. Raises QueueFullError under backpressure."""
+    job_id = await asyncio.to_thread(enqueue_job, **kwargs)
+    _wake_workers()
+    return job_id
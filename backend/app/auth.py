@@ -1,21 +1,137 @@
+import asyncio
 import bcrypt
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt
 from datetime import datetime, timedelta
 import os
 
 # --- Password hashing and verification ---
+#
+# bcrypt is deliberately slow (~100-300 ms per call), so every hash/verify runs on a
+# small dedicated thread pool: async endpoints await it without blocking the event
+# loop, and a login storm queues up here (and is shed with PasswordHasherBusy)
+# instead of starving the rest of the API of CPU and threads.
+
+# bcrypt cost factor for new hashes; existing hashes with a different cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+# Concurrent hash/verify operations (roughly: CPU cores you are willing to spend on bcrypt)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+
+# Hash requests allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+# bcrypt only looks at the first 72 bytes; older bcrypt releases truncated silently
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when more than PASSWORD_HASH_MAX_PENDING hash requests are already queued."""
+
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="pwhash")
+_lock = threading.Lock()
+_pending = 0
+_metrics = {
+    "calls": 0,
+    "rejected": 0,
+    "rehashed": 0,
+    "queue_wait_total": 0.0,
+    "queue_wait_max": 0.0,
+    "hash_time_total": 0.0,
+    "hash_time_max": 0.0,
+}
+
+def _encode(password: str) -> bytes:
+    return password.encode()[:BCRYPT_MAX_BYTES]
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+def _check(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode())
+    except ValueError:
+        # Malformed or non-bcrypt hash stored for this user
+        return False
+
+def _timed(fn, submitted, *args):
+    """Run `fn` on a pool thread, recording how long it queued and how long it ran."""
+    global _pending
+    started = time.monotonic()
+    try:
+        return fn(*args)
+    finally:
+        finished = time.monotonic()
+        wait, took = started - submitted, finished - started
+        with _lock:
+            _pending -= 1
+            _metrics["calls"] += 1
+            _metrics["queue_wait_total"] += wait
+            _metrics["queue_wait_max"] = max(_metrics["queue_wait_max"], wait)
+            _metrics["hash_time_total"] += took
+            _metrics["hash_time_max"] = max(_metrics["hash_time_max"], took)
+
+def _submit(fn, *args):
+    global _pending
+    with _lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _metrics["rejected"] += 1
+            raise PasswordHasherBusy()
+        _pending += 1
+    return _executor.submit(_timed, fn, time.monotonic(), *args)
 
 def hash_password(password: str) -> str:
-    """Hashes a plain text password using bcrypt.
-    Returns the hashed password as a string."""
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    """Hashes a plain text password using bcrypt (on the hashing pool; blocks the caller)."""
+    return _submit(_hash, password).result()
 
 def verify_password(password: str, hashed: str) -> bool:
     """
-    Verifies a plain text password against a hashed password.
+    Verifies a plain text password against a hashed password (on the hashing pool).
     Returns True if the password matches, False otherwise.
     """
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+    return _submit(_check, password, hashed).result()
+
+async def hash_password_async(password: str) -> str:
+    """Like hash_password, but awaits the pool instead of blocking the event loop."""
+    return await asyncio.wrap_future(_submit(_hash, password))
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Like verify_password, but awaits the pool instead of blocking the event loop."""
+    return await asyncio.wrap_future(_submit(_check, password, hashed))
+
+def needs_rehash(hashed: str) -> bool:
+    """True if `hashed` is not a bcrypt hash at the current BCRYPT_ROUNDS cost."""
+    parts = (hashed or "").split("$")
+    # "$2b$12$<salt+hash>" -> ["", "2b", "12", "..."]
+    if len(parts) != 4 or parts[1] not in ("2a", "2b", "2y"):
+        return True
+    return parts[2] != f"{BCRYPT_ROUNDS:02d}"
+
+async def verify_and_update(password: str, hashed: str):
+    """
+    Verify a login password. Returns (ok, new_hash): new_hash is set when the
+    password matched but the stored hash uses outdated parameters and should be replaced.
+    """
+    if not await verify_password_async(password, hashed):
+        return False, None
+    if not needs_rehash(hashed):
+        return True, None
+    new_hash = await hash_password_async(password)
+    with _lock:
+        _metrics["rehashed"] += 1
+    return True, new_hash
+
+def hashing_metrics() -> dict:
+    """Snapshot of pool load: averages/maxima of queue wait vs. bcrypt time (seconds)."""
+    with _lock:
+        snapshot = dict(_metrics, pending=_pending, workers=PASSWORD_HASH_WORKERS, rounds=BCRYPT_ROUNDS)
+    calls = snapshot["calls"] or 1
+    snapshot["queue_wait_avg"] = snapshot["queue_wait_total"] / calls
+    snapshot["hash_time_avg"] = snapshot["hash_time_total"] / calls
+    return snapshot
 
 # --- JWT encoding/decoding (optional, for advanced use) ---
 
@@ -0,0 +1,374 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models import RequirementCache, RequirementMatchCache, ProfileTrendsCache, ProfessionTrends
+
+# --- Generic in-process LRU cache with TTL ---
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache where every entry also expires after `ttl` seconds.
+    Used as the fast in-process tier in front of slower lookups (DB, LLM, network).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+
+    def pop_matching(self, predicate):
+        """Remove every entry whose (key, value) satisfies `predicate`."""
+        with self._lock:
+            doomed = [k for k, (v, _) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# --- Hashing helpers ---
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different copies hash the same."""
+    return re.sub(r"\s+", " ", (text or "")).strip().casefold()
+
+def content_hash(*parts) -> str:
+    """SHA-256 hex digest of the given str/bytes parts (joined with a separator)."""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = (part or "").encode("utf-8")
+        h.update(part)
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+def _prune_cache_table(model, max_rows: int) -> int:
+    """Delete expired rows of a cache table, then the oldest rows beyond `max_rows`."""
+    db = SessionLocal()
+    try:
+        deleted = db.query(model).filter(
+            model.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+        overflow = db.query(model).count() - max_rows
+        if overflow > 0:
+            oldest_ids = [
+                row_id for (row_id,) in db.query(model.id)
+                .order_by(model.created_at.asc())
+                .limit(overflow)
+            ]
+            deleted += db.query(model).filter(
+                model.id.in_(oldest_ids)
+            ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+# === Requirement extraction cache (LRU -> Postgres) ===
+
+REQUIREMENTS_CACHE_TTL_DAYS = int(os.getenv("REQUIREMENTS_CACHE_TTL_DAYS", 30))
+REQUIREMENTS_CACHE_MAX_ROWS = int(os.getenv("REQUIREMENTS_CACHE_MAX_ROWS", 5000))
+REQUIREMENTS_CACHE_LRU_SIZE = int(os.getenv("REQUIREMENTS_CACHE_LRU_SIZE", 512))
+
+_requirements_lru = TTLCache(
+    maxsize=REQUIREMENTS_CACHE_LRU_SIZE,
+    ttl=REQUIREMENTS_CACHE_TTL_DAYS * 86400,
+)
+
+def requirements_cache_key(job_text: str, model: str, prompt_version: str) -> str:
+    """Cache key for a job posting under a given model and prompt version."""
+    return content_hash(model, prompt_version, normalize_text(job_text))
+
+def get_cached_requirements(key: str):
+    """
+    Return the cached requirement list for `key`, or None on a miss.
+    Checks the in-process LRU first, then the requirement_cache table.
+    """
+    cached = _requirements_lru.get(key)
+    if cached is not None:
+        return cached
+
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(RequirementCache)
+            .filter(
+                RequirementCache.cache_key == key,
+                RequirementCache.expires_at > datetime.utcnow(),
+            )
+            .first()
+        )
+        if row is None:
+            return None
+        requirements = json.loads(row.requirements)
+    except Exception as e:
+        print("Requirement cache lookup failed:", e)
+        return None
+    finally:
+        db.close()
+
+    _requirements_lru.set(key, requirements)
+    return requirements
+
+def store_requirements(key: str, requirements, model: str, prompt_version: str):
+    """
+    Save a requirement list in both tiers. The table is kept bounded by
+    prune_requirement_cache (run by the maintenance sweeper), not here.
+    """
+    _requirements_lru.set(key, requirements)
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.add(RequirementCache(
+            cache_key=key,
+            model=model,
+            prompt_version=prompt_version,
+            requirements=json.dumps(requirements),
+            created_at=now,
+            expires_at=now + timedelta(days=REQUIREMENTS_CACHE_TTL_DAYS),
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker cached the same posting first
+            db.rollback()
+    except Exception as e:
+        db.rollback()
+        print("Requirement cache store failed:", e)
+    finally:
+        db.close()
+
+def prune_requirement_cache() -> int:
+    """Purge expired rows and the oldest rows beyond REQUIREMENTS_CACHE_MAX_ROWS."""
+    return _prune_cache_table(RequirementCache, REQUIREMENTS_CACHE_MAX_ROWS)
+
+# === Requirement match memo (per resume + requirement, LRU -> Postgres) ===
+
+MATCH_CACHE_TTL_DAYS = int(os.getenv("MATCH_CACHE_TTL_DAYS", 30))
+MATCH_CACHE_MAX_ROWS = int(os.getenv("MATCH_CACHE_MAX_ROWS", 50000))
+MATCH_CACHE_LRU_SIZE = int(os.getenv("MATCH_CACHE_LRU_SIZE", 4096))
+
+_matches_lru = TTLCache(
+    maxsize=MATCH_CACHE_LRU_SIZE,
+    ttl=MATCH_CACHE_TTL_DAYS * 86400,
+)
+
+def match_cache_key(resume_hash: str, requirement: str, explanation: str, model: str, prompt_version: str) -> str:
+    """
+    Cache key for one requirement judged against one resume (by content hash).
+    The explanation is part of the key: "Python" asking for 5+ years is a different question.
+    """
+    return content_hash(
+        model, prompt_version, resume_hash, normalize_text(requirement), normalize_text(explanation)
+    )
+
+def get_cached_matches(keys):
+    """
+    Return {key: {"met": bool, "explanation": str}} for the keys that have a
+    memoized verdict. Checks the in-process LRU first, then one query for the rest.
+    """
+    found = {}
+    missing = []
+    for key in keys:
+        cached = _matches_lru.get(key)
+        if cached is not None:
+            found[key] = cached
+        else:
+            missing.append(key)
+    if not missing:
+        return found
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(RequirementMatchCache)
+            .filter(
+                RequirementMatchCache.cache_key.in_(missing),
+                RequirementMatchCache.expires_at > datetime.utcnow(),
+            )
+            .all()
+        )
+    except Exception as e:
+        print("Match cache lookup failed:", e)
+        return found
+    finally:
+        db.close()
+
+    for row in rows:
+        verdict = {"met": row.met, "explanation": row.explanation or ""}
+        _matches_lru.set(row.cache_key, verdict)
+        found[row.cache_key] = verdict
+    return found
+
+def store_matches(verdicts, model: str, prompt_version: str):
+    """
+    Save {key: {"met", "explanation"}} verdicts in both tiers. The table is kept
+    bounded by prune_match_cache (run by the maintenance sweeper), not here.
+    """
+    for key, verdict in verdicts.items():
+        _matches_lru.set(key, verdict)
+
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        existing = {
+            key for (key,) in db.query(RequirementMatchCache.cache_key)
+            .filter(RequirementMatchCache.cache_key.in_(list(verdicts)))
+        }
+        for key, verdict in verdicts.items():
+            if key in existing:
+                continue
+            db.add(RequirementMatchCache(
+                cache_key=key,
+                model=model,
+                prompt_version=prompt_version,
+                met=verdict["met"],
+                explanation=verdict["explanation"],
+                created_at=now,
+                expires_at=now + timedelta(days=MATCH_CACHE_TTL_DAYS),
+            ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker memoized some of the same verdicts first
+            db.rollback()
+    except Exception as e:
+        db.rollback()
+        print("Match cache store failed:", e)
+    finally:
+        db.close()
+
+def prune_match_cache() -> int:
+    """Purge expired rows and the oldest rows beyond MATCH_CACHE_MAX_ROWS."""
+    return _prune_cache_table(RequirementMatchCache, MATCH_CACHE_MAX_ROWS)
+
+# === Profile trends cache (per user, stale-while-revalidate) ===
+
+# After this long a cached trends list is served stale and refreshed in the background
+TRENDS_CACHE_FRESH_HOURS = int(os.getenv("TRENDS_CACHE_FRESH_HOURS", 24))
+
+def trends_input_hash(profession: str, bio: str, prompt_version: str) -> str:
+    """Hash of everything the trends prompt depends on."""
+    return content_hash(prompt_version, normalize_text(profession), normalize_text(bio))
+
+def get_cached_trends(db, user_id: int, input_hash: str):
+    """
+    Return (trends, is_fresh) for the user, or (None, False) when there is no
+    usable entry for this exact profile (missing, invalidated, profile changed,
+    or an empty list stored by an earlier failed generation).
+    """
+    row = db.query(ProfileTrendsCache).filter(ProfileTrendsCache.user_id == user_id).first()
+    if row is None or row.input_hash != input_hash:
+        return None, False
+    trends = json.loads(row.trends)
+    if not trends:
+        return None, False
+    fresh = row.generated_at > datetime.utcnow() - timedelta(hours=TRENDS_CACHE_FRESH_HOURS)
+    return trends, fresh
+
+def store_trends(db, user_id: int, input_hash: str, trends):
+    """Insert or replace the user's cached trends."""
+    row = db.query(ProfileTrendsCache).filter(ProfileTrendsCache.user_id == user_id).first()
+    if row is None:
+        row = ProfileTrendsCache(user_id=user_id)
+        db.add(row)
+    row.input_hash = input_hash
+    row.trends = json.dumps(trends)
+    row.generated_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Concurrent first-time store for the same user; theirs is just as good
+        db.rollback()
+
+def invalidate_trends(db, user_id: int):
+    """Drop the user's cached trends (e.g. after a profile edit)."""
+    db.query(ProfileTrendsCache).filter(ProfileTrendsCache.user_id == user_id).delete(
+        synchronize_session=False
+    )
+
+# === Shared trends catalog (per profession) ===
+
+# Catalog entries older than this are regenerated by the precompute job
+TRENDS_CATALOG_MAX_AGE_HOURS = int(os.getenv("TRENDS_CATALOG_MAX_AGE_HOURS", 24 * 7))
+
+def get_profession_trends(db, profession: str, prompt_version: str):
+    """Return the catalog trends for this profession (any age), or None (also for an empty list)."""
+    row = (
+        db.query(ProfessionTrends)
+        .filter(
+            ProfessionTrends.profession_key == normalize_text(profession),
+            ProfessionTrends.prompt_version == prompt_version,
+        )
+        .first()
+    )
+    trends = json.loads(row.trends) if row else None
+    return trends or None
+
+def is_profession_trends_fresh(db, profession: str, prompt_version: str) -> bool:
+    """True if the catalog has a current-version, non-empty entry younger than TRENDS_CATALOG_MAX_AGE_HOURS."""
+    cutoff = datetime.utcnow() - timedelta(hours=TRENDS_CATALOG_MAX_AGE_HOURS)
+    return db.query(ProfessionTrends.id).filter(
+        ProfessionTrends.profession_key == normalize_text(profession),
+        ProfessionTrends.prompt_version == prompt_version,
+        ProfessionTrends.generated_at > cutoff,
+        ProfessionTrends.trends != "[]",
+    ).first() is not None
+
+def store_profession_trends(db, profession: str, trends, prompt_version: str):
+    """Insert or replace the catalog entry for this profession."""
+    key = normalize_text(profession)
+    row = db.query(ProfessionTrends).filter(ProfessionTrends.profession_key == key).first()
+    if row is None:
+        row = ProfessionTrends(profession_key=key)
+        db.add(row)
+    row.profession = profession.strip()
+    row.prompt_version = prompt_version
+    row.trends = json.dumps(trends)
+    row.generated_at = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 # Get the absolute path to the directory where this file is located.
@@ -12,12 +14,92 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, '..', 'app.db')}"
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
+# --- Connection pool settings (per engine, per server process) ---
+
+# Connections kept open, and extra ones allowed under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+
+# Recycle connections before Railway's proxy drops them as idle
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 300))
+
+# Server-side cap on any single statement (0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
+
+
+def _is_postgres(url) -> bool:
+    return url.get_backend_name() == "postgresql"
+
+def _pool_options(url):
+    """Pool sizing/health options; SQLite (local dev) keeps SQLAlchemy's defaults."""
+    if not _is_postgres(url):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        # Test each connection on checkout so a dropped idle connection is replaced, not raised
+        "pool_pre_ping": True,
+    }
+
+def _sync_connect_args(url):
+    if not _is_postgres(url) or not DB_STATEMENT_TIMEOUT_MS:
+        return {}
+    return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+
+def _async_url_and_connect_args(url):
+    """Same database through an async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    if not _is_postgres(url):
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    # asyncpg does not understand libpq's sslmode; translate it to its ssl argument
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    connect_args = {}
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = "require" if sslmode in ("require", "prefer", "allow") else sslmode
+    if DB_STATEMENT_TIMEOUT_MS:
+        connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+# Railway hands out postgres:// URLs, which SQLAlchemy no longer accepts as an alias
+if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
+    SQLALCHEMY_DATABASE_URL = "postgresql://" + SQLALCHEMY_DATABASE_URL[len("postgres://"):]
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+if _url.drivername == "postgresql":
+    # Pin the driver we install (psycopg2-binary) rather than SQLAlchemy's default
+    _url = _url.set(drivername="postgresql+psycopg2")
+
 # Create the SQLAlchemy engine for connecting to the PostgreSQL database.
-engine = create_engine(SQLALCHEMY_DATABASE_URL)  # <-- Removed connect_args for Postgres
+# Used by sync endpoints (FastAPI runs them in its thread pool) and background jobs.
+engine = create_engine(
+    _url,
+    connect_args=_sync_connect_args(_url),
+    **_pool_options(_url),
+)
 
 # Set up a session factory for database sessions.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for `async def` endpoints, so DB round trips don't block the event loop
+_async_url, _async_connect_args = _async_url_and_connect_args(_url)
+async_engine = create_async_engine(
+    _async_url,
+    connect_args=_async_connect_args,
+    **_pool_options(_url),
+)
+
+# expire_on_commit=False: handlers read attributes after commit without another round trip
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Base class for all ORM models.
 Base = declarative_base()
 
@@ -31,4 +113,11 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Dependency for async endpoints: yields an AsyncSession and closes it after use.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import PyPDF2
+from docx import Document
+
+# --- Extraction budgets (per document) ---
+
+# Worker processes used for PDF/DOCX parsing (CPU-bound, kept off the event loop)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", 2))
+
+# Stop reading after this many PDF pages; a resume never needs more
+EXTRACTION_MAX_PAGES = int(os.getenv("EXTRACTION_MAX_PAGES", 30))
+
+# Stop reading once a document has used this much parse time (checked between pages)
+EXTRACTION_TIME_BUDGET = float(os.getenv("EXTRACTION_TIME_BUDGET", 5.0))
+
+# Hard limit on how long a document may take once a worker has picked it up
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", 15.0))
+
+
+class ExtractionTimeout(Exception):
+    """Raised when a document could not be parsed within EXTRACTION_TIMEOUT."""
+
+
+# === Page/paragraph generators ===
+
+def iter_pdf_pages(file, max_pages=EXTRACTION_MAX_PAGES, deadline=None):
+    """
+    Yield the text of each PDF page, stopping at `max_pages` pages
+    or once `deadline` (a time.monotonic() value) has passed.
+    """
+    pdf_reader = PyPDF2.PdfReader(file)
+    for i, page in enumerate(pdf_reader.pages):
+        if i >= max_pages:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        yield page.extract_text() or ''
+
+def iter_docx_paragraphs(file, deadline=None):
+    """Yield the text of each paragraph in a Word (.docx) file."""
+    document = Document(file)
+    for para in document.paragraphs:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        yield para.text
+
+def extract_text_from_pdf(file, max_pages=EXTRACTION_MAX_PAGES, time_budget=EXTRACTION_TIME_BUDGET):
+    """Extract text from a PDF file (pages joined once, within the page/time budget)."""
+    deadline = time.monotonic() + time_budget
+    return ''.join(iter_pdf_pages(file, max_pages=max_pages, deadline=deadline))
+
+def extract_text_from_docx(file, time_budget=EXTRACTION_TIME_BUDGET):
+    """Extract all text from a Word (.docx) file."""
+    deadline = time.monotonic() + time_budget
+    return '\n'.join(iter_docx_paragraphs(file, deadline=deadline))
+
+def extract_text_from_bytes(filename: str, data: bytes):
+    """
+    Extract text from raw file contents.
+    Supports: PDF (.pdf), Word (.docx), and plain text (.txt).
+    """
+    filename = (filename or "").lower()
+    if filename.endswith('.pdf'):
+        return extract_text_from_pdf(BytesIO(data))
+    elif filename.endswith('.docx'):
+        return extract_text_from_docx(BytesIO(data))
+    else:
+        # Treat everything else as plain text
+        return data.decode("utf-8", errors="ignore")
+
+# === Process pool ===
+
+_pool = None
+# Bounds submissions to the number of workers, so a job never sits in the pool's queue
+# while its timeout runs (asyncio primitives bind to the running loop; create lazily)
+_slots = None
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Lazily create the shared, bounded extraction pool."""
+    global _pool
+    if _pool is None:
+        # 'spawn' so workers only import this module, not the whole app
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACTION_WORKERS)
+    return _slots
+
+def _terminate_workers(processes):
+    """Kill whatever is still running in a retired pool (e.g. a worker stuck on one file)."""
+    for process in processes:
+        try:
+            if process.is_alive():
+                process.terminate()
+        except Exception as e:
+            print("Could not stop extraction worker:", e)
+
+def _retire_pool(pool):
+    """
+    Replace a pool whose worker timed out. New documents go to a fresh pool right
+    away; the old one gets EXTRACTION_TIMEOUT to finish its other documents, then
+    its processes are terminated so the hung worker doesn't run on.
+    """
+    global _pool
+    if _pool is not pool:
+        return  # already retired by another timed-out document
+    _pool = None
+    # shutdown() drops the pool's process table, so take it first
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False)
+    asyncio.get_running_loop().call_later(EXTRACTION_TIMEOUT, _terminate_workers, processes)
+
+def shutdown_extraction_pool():
+    """Stop the worker processes (called on app shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def extract_text_async(filename: str, data: bytes) -> str:
+    """
+    Extract text without blocking the event loop.
+    PDF/DOCX parsing runs in the process pool, at most EXTRACTION_WORKERS at a time
+    (callers beyond that wait for a slot); plain text is decoded inline.
+    Raises ExtractionTimeout after EXTRACTION_TIMEOUT; the pool is then replaced.
+    """
+    lowered = (filename or "").lower()
+    if not (lowered.endswith('.pdf') or lowered.endswith('.docx')):
+        return extract_text_from_bytes(filename, data)
+
+    loop = asyncio.get_running_loop()
+    async with _get_slots():
+        # A free slot means a free worker, so the timeout covers parsing, not queueing
+        pool = get_extraction_pool()
+        future = loop.run_in_executor(pool, extract_text_from_bytes, filename, data)
+        try:
+            return await asyncio.wait_for(future, timeout=EXTRACTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            # The worker is still busy with this file; don't count it as a free slot
+            _retire_pool(pool)
+            raise ExtractionTimeout(f"Parsing {filename} took longer than {EXTRACTION_TIMEOUT:g}s")
@@ -0,0 +1,158 @@
+import asyncio
+import ipaddress
+import os
+
+import httpx
+
+from app.cache_utils import TTLCache
+from app.database import SessionLocal
+from app.models import LoginEvent, UserSession
+
+# --- IP -> "City, Region, Country" lookups (resolved after login, never on its critical path) ---
+
+# Optional MaxMind-format City database (.mmdb); when set, lookups need no network at all.
+# Requires the `geoip2` package; falls back to ipapi.co if it is missing or unreadable.
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH", "")
+
+GEOIP_TIMEOUT = float(os.getenv("GEOIP_TIMEOUT", 2.0))
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", 10000))
+GEOIP_CACHE_TTL_HOURS = int(os.getenv("GEOIP_CACHE_TTL_HOURS", 24))
+
+LOCATION_UNAVAILABLE = "Location unavailable"
+
+_cache = TTLCache(maxsize=GEOIP_CACHE_SIZE, ttl=GEOIP_CACHE_TTL_HOURS * 3600)
+_client = None
+_reader = None
+_reader_failed = False
+
+
+def is_local_ip(ip: str) -> bool:
+    """True for missing/unparseable addresses and loopback, private, link-local or reserved ones."""
+    if not ip or ip == "localhost":
+        return True
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return True
+    # Unwrap IPv4-mapped IPv6 (::ffff:10.0.0.1) before classifying
+    if getattr(addr, "ipv4_mapped", None):
+        addr = addr.ipv4_mapped
+    return (
+        addr.is_private
+        or addr.is_loopback
+        or addr.is_link_local
+        or addr.is_reserved
+        or addr.is_unspecified
+    )
+
+def _format_location(city, region, country):
+    parts = [p for p in [city, region, country] if p]
+    return ", ".join(parts) if parts else LOCATION_UNAVAILABLE
+
+# === Offline database ===
+
+def _get_reader():
+    """Open the local GeoIP database on first use, or return None if not configured."""
+    global _reader, _reader_failed
+    if not GEOIP_DB_PATH or _reader_failed:
+        return None
+    if _reader is None:
+        try:
+            import geoip2.database
+
+            _reader = geoip2.database.Reader(GEOIP_DB_PATH)
+        except Exception as e:
+            print("GeoIP database unavailable, using ipapi.co:", e)
+            _reader_failed = True
+            return None
+    return _reader
+
+def _lookup_offline(reader, ip):
+    try:
+        record = reader.city(ip)
+    except Exception:
+        return LOCATION_UNAVAILABLE
+    region = record.subdivisions.most_specific.name if record.subdivisions else None
+    return _format_location(record.city.name, region, record.country.name)
+
+# === ipapi.co ===
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared pooled client so lookups reuse connections instead of a new TLS handshake each time."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=GEOIP_TIMEOUT,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+    return _client
+
+async def close_client():
+    """Close the pooled client and the database reader (called on app shutdown)."""
+    global _client, _reader
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _reader is not None:
+        _reader.close()
+        _reader = None
+
+async def _lookup_online(ip):
+    # Local / private IPs -> call /json/ (uses the server's external IP, handy in dev)
+    if is_local_ip(ip):
+        lookup_url = "https://ipapi.co/json/"
+    else:
+        lookup_url = f"https://ipapi.co/{ip}/json/"
+    try:
+        resp = await _get_client().get(lookup_url)
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        return _format_location(data.get("city"), data.get("region"), data.get("country_name"))
+    except Exception:
+        return None
+
+async def geo_lookup(ip: str) -> str:
+    """
+    Resolve an IP address to "City, Region, Country".
+    Uses the local database when configured, otherwise ipapi.co; results are memoized.
+    """
+    key = "local" if is_local_ip(ip) else ip
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    reader = _get_reader()
+    if reader is not None and key != "local":
+        location = await asyncio.to_thread(_lookup_offline, reader, ip)
+    else:
+        location = await _lookup_online(ip)
+
+    if location is None:
+        # Network failure: don't cache, so the next login gets another chance
+        return LOCATION_UNAVAILABLE
+    _cache.set(key, location)
+    return location
+
+# === Background resolution for new logins ===
+
+def _store_location(session_id, location):
+    db = SessionLocal()
+    try:
+        db.query(LoginEvent).filter(LoginEvent.session_id == session_id).update(
+            {LoginEvent.location: location}, synchronize_session=False
+        )
+        db.query(UserSession).filter(UserSession.session_id == session_id).update(
+            {UserSession.location: location}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+async def resolve_login_location(session_id: str, ip: str):
+    """Look up the login IP and fill in location on its login_events/user_sessions rows."""
+    try:
+        location = await geo_lookup(ip)
+        await asyncio.to_thread(_store_location, session_id, location)
+    except Exception as e:
+        print("Could not store login location:", e)
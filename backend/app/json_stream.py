@@ -0,0 +1,121 @@
+import json
+
+# --- Incremental JSON array parsing for LLM output ---
+#
+# Models are asked for a JSON array of objects, but the text that comes back may be
+# wrapped in prose or code fences, nested in an object ({"items": [...]}), streamed
+# in arbitrary chunks, or cut off at max_tokens. JsonArrayParser pulls out every
+# element of the outermost array as soon as its closing brace arrives, so a
+# truncated reply still yields all of its complete items.
+
+
+def item_validator(**fields):
+    """
+    Build a validator for array items: each keyword names a required key and the
+    type (or tuple of types) its value must have. Required strings must be non-blank.
+    """
+    def validate(item):
+        if not isinstance(item, dict):
+            return False
+        for key, types in fields.items():
+            value = item.get(key)
+            if not isinstance(value, types):
+                return False
+            if isinstance(value, str) and not value.strip():
+                return False
+        return True
+    return validate
+
+
+class JsonArrayParser:
+    """
+    Feed text chunks with feed(); each call returns the objects of the outermost
+    JSON array that were completed by that chunk (and pass `validator`, if given).
+    Objects that fail to decode or validate are skipped and counted in `rejected`.
+    """
+
+    def __init__(self, validator=None):
+        self.validator = validator
+        self.items = []
+        self.rejected = 0
+        self._stack = []          # open containers: "[" or "{"
+        self._array_depth = None  # stack depth inside the outermost array
+        self._capture = None      # chars of the item object being read
+        self._objects_seen = 0    # item objects started inside the outermost array
+        self._in_string = False
+        self._escaped = False
+        self._lone_object = False  # whole reply was one closed object (see parse_json_items)
+
+    def feed(self, text):
+        completed = []
+        for ch in text:
+            if self._capture is not None:
+                self._capture.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                # Quotes only start a string inside a container; stray prose quotes are ignored
+                self._in_string = bool(self._stack)
+            elif ch in "[{":
+                if ch == "[" and self._array_depth is None:
+                    self._array_depth = len(self._stack) + 1
+                elif ch == "{" and self._capture is None and len(self._stack) == self._array_depth:
+                    self._capture = [ch]
+                    self._objects_seen += 1
+                self._stack.append(ch)
+            elif ch in "]}" and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._capture is not None and len(self._stack) == self._array_depth:
+                    item = self._decode("".join(self._capture))
+                    self._capture = None
+                    if item is not None:
+                        completed.append(item)
+                elif ch == "]" and self._array_depth is not None and len(self._stack) < self._array_depth:
+                    # Outermost array closed; anything after it is trailing prose.
+                    # An array without objects (e.g. "[see below]" in prose) doesn't count.
+                    self._array_depth = -1 if self._objects_seen else None
+        self.items.extend(completed)
+        return completed
+
+    def _decode(self, raw):
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            self.rejected += 1
+            return None
+        if self.validator is not None and not self.validator(item):
+            self.rejected += 1
+            return None
+        return item
+
+    @property
+    def complete(self) -> bool:
+        """True once the outermost array (or a lone top-level object) has been closed."""
+        return self._array_depth == -1 or self._lone_object
+
+
+def parse_json_items(content, validator=None):
+    """
+    All valid items of the outermost JSON array in `content`, including the complete
+    ones before a truncation point. A reply that is a single object (no array) counts
+    as one item. Returns (items, parser) so callers can check `rejected`/`complete`.
+    """
+    parser = JsonArrayParser(validator)
+    parser.feed(content or "")
+    if not parser.items and parser._array_depth is None:
+        # No array at all: accept a lone top-level object
+        start, end = (content or "").find("{"), (content or "").rfind("}")
+        if start != -1 and end > start:
+            item = parser._decode(content[start:end + 1])
+            if item is not None:
+                parser.items.append(item)
+                parser._lone_object = True
+    return parser.items, parser
@@ -0,0 +1,268 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import openai
+
+# --- Single entry point for OpenAI chat completions ---
+#
+# Every call goes through the same client-side limits before it reaches the API:
+#   1. token buckets on requests/minute and tokens/minute (wait instead of getting a 429)
+#   2. a concurrency cap on in-flight calls
+#   3. a per-call timeout, and jittered exponential backoff on 429/5xx/timeouts
+# and records latency and token usage per call purpose (see llm_metrics()).
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 20))
+
+# Keep these a little under the account's OpenAI limits
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200_000))
+
+# In-flight calls from request handlers (async) and from background/sync code (trends, scripts).
+# Background work gets its own, smaller cap so it can never crowd out interactive requests.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_BACKGROUND_CONCURRENCY = int(os.getenv("LLM_MAX_BACKGROUND_CONCURRENCY", 2))
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+_api_key = os.getenv("OPENAI_API_KEY")
+# Retries are handled here (with the shared limiter), so the SDK's own are off
+_async_client = openai.AsyncOpenAI(api_key=_api_key, timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
+_sync_client = openai.OpenAI(api_key=_api_key, timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute`/60 per second.
+    reserve() always succeeds but may leave the bucket in debt; the caller then
+    waits the returned number of seconds, so bursts are spread out instead of rejected.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` and return how long to wait before using it."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate) if self.rate else 0.0
+
+    def refund(self, amount: float):
+        """Give back an over-estimate once the real usage is known."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+_request_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+_token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+
+# asyncio primitives bind to the running loop on Python 3.9, so create lazily
+_async_gate = None
+_sync_gate = threading.BoundedSemaphore(LLM_MAX_BACKGROUND_CONCURRENCY)
+
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+
+def _get_async_gate():
+    global _async_gate
+    if _async_gate is None:
+        _async_gate = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _async_gate
+
+def estimate_tokens(messages, max_tokens) -> int:
+    """Rough prompt size (~4 characters per token) plus the completion budget."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + (max_tokens or 0)
+
+def _reserve(estimate) -> float:
+    return max(_request_bucket.reserve(1), _token_bucket.reserve(estimate))
+
+def _backoff_delay(attempt, error):
+    """Server-provided Retry-After when present, else full-jitter exponential backoff."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    cap = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(cap / 2, cap)
+
+def _record(purpose, latency=0.0, usage=None, error=False, retries=0, throttled=0.0):
+    with _metrics_lock:
+        m = _metrics.setdefault(purpose, {
+            "calls": 0, "errors": 0, "retries": 0,
+            "latency_total": 0.0, "latency_max": 0.0, "throttled_seconds": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        })
+        m["calls"] += 1
+        m["errors"] += int(error)
+        m["retries"] += retries
+        m["throttled_seconds"] += throttled
+        m["latency_total"] += latency
+        m["latency_max"] = max(m["latency_max"], latency)
+        if usage is not None:
+            m["prompt_tokens"] += usage.prompt_tokens or 0
+            m["completion_tokens"] += usage.completion_tokens or 0
+
+def llm_metrics() -> dict:
+    """Per-purpose snapshot: calls, errors, retries, latency avg/max, throttling, token usage."""
+    with _metrics_lock:
+        snapshot = {purpose: dict(m) for purpose, m in _metrics.items()}
+    for m in snapshot.values():
+        m["latency_avg"] = m["latency_total"] / m["calls"] if m["calls"] else 0.0
+    return snapshot
+
+def _settle_tokens(estimate, usage):
+    if usage is not None and usage.total_tokens:
+        _token_bucket.refund(estimate - usage.total_tokens)
+
+def _release_tokens(estimate):
+    """A failed attempt used no tokens; give its whole reservation back."""
+    _token_bucket.refund(estimate)
+
+# === Public API ===
+
+async def chat_completion(purpose, messages, *, model, max_tokens, timeout=None, **kwargs):
+    """
+    Rate-limited, retried chat completion for async code.
+    `purpose` labels the call in llm_metrics(). Raises the last error once retries are exhausted.
+    """
+    estimate = estimate_tokens(messages, max_tokens)
+    throttled = 0.0
+    attempt = 0
+    while True:
+        wait = _reserve(estimate)
+        if wait:
+            throttled += wait
+            await asyncio.sleep(wait)
+        started = time.monotonic()
+        try:
+            async with _get_async_gate():
+                response = await _async_client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens,
+                    timeout=timeout or LLM_TIMEOUT_SECONDS, **kwargs,
+                )
+        except _RETRYABLE as e:
+            _release_tokens(estimate)
+            if attempt >= LLM_MAX_RETRIES:
+                _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+                raise
+            await asyncio.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+            continue
+        except Exception:
+            _release_tokens(estimate)
+            _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+            raise
+        _settle_tokens(estimate, response.usage)
+        _record(purpose, time.monotonic() - started, response.usage, retries=attempt, throttled=throttled)
+        return response
+
+def chat_completion_sync(purpose, messages, *, model, max_tokens, timeout=None, **kwargs):
+    """Blocking variant of chat_completion for background threads and scripts."""
+    estimate = estimate_tokens(messages, max_tokens)
+    throttled = 0.0
+    attempt = 0
+    while True:
+        wait = _reserve(estimate)
+        if wait:
+            throttled += wait
+            time.sleep(wait)
+        started = time.monotonic()
+        try:
+            with _sync_gate:
+                response = _sync_client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens,
+                    timeout=timeout or LLM_TIMEOUT_SECONDS, **kwargs,
+                )
+        except _RETRYABLE as e:
+            _release_tokens(estimate)
+            if attempt >= LLM_MAX_RETRIES:
+                _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+                raise
+            time.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+            continue
+        except Exception:
+            _release_tokens(estimate)
+            _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+            raise
+        _settle_tokens(estimate, response.usage)
+        _record(purpose, time.monotonic() - started, response.usage, retries=attempt, throttled=throttled)
+        return response
+
+async def stream_chat_completion(purpose, messages, *, model, max_tokens, timeout=None, **kwargs):
+    """
+    Streamed chat completion: yields the raw chunks. Holds a concurrency slot for the
+    whole stream; retries only if the request fails before any chunk has been yielded.
+    """
+    estimate = estimate_tokens(messages, max_tokens)
+    throttled = 0.0
+    attempt = 0
+    while True:
+        wait = _reserve(estimate)
+        if wait:
+            throttled += wait
+            await asyncio.sleep(wait)
+        started = time.monotonic()
+        usage = None
+        yielded = False
+        try:
+            async with _get_async_gate():
+                stream = await _async_client.chat.completions.create(
+                    model=model, messages=messages, max_tokens=max_tokens,
+                    timeout=timeout or LLM_TIMEOUT_SECONDS, stream=True,
+                    stream_options={"include_usage": True}, **kwargs,
+                )
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = chunk.usage
+                    yielded = True
+                    yield chunk
+        except _RETRYABLE as e:
+            if not yielded:
+                _release_tokens(estimate)
+            if yielded or attempt >= LLM_MAX_RETRIES:
+                _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+                raise
+            await asyncio.sleep(_backoff_delay(attempt, e))
+            attempt += 1
+            continue
+        except Exception:
+            if not yielded:
+                _release_tokens(estimate)
+            _record(purpose, time.monotonic() - started, error=True, retries=attempt, throttled=throttled)
+            raise
+        _settle_tokens(estimate, usage)
+        _record(purpose, time.monotonic() - started, usage, retries=attempt, throttled=throttled)
+        return
+
+def completion_text(response) -> str:
+    """Text of the first choice ('' if the model returned nothing)."""
+    return response.choices[0].message.content or ""
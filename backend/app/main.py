@@ -4,23 +4,61 @@ load_dotenv()  # Load secrets from .env for devs
 from fastapi import BackgroundTasks
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-import PyPDF2
-from docx import Document
-import openai
+from fastapi.responses import StreamingResponse, JSONResponse
+import base64
 import os
 import re
 import json
+import asyncio
+import threading
+from typing import List, Optional
 from app.s3_utils import upload_file_to_s3
+from app.extraction import (
+    extract_text_async,
+    shutdown_extraction_pool,
+    ExtractionTimeout,
+)
+from app import semantic_match
+from app import skill_match
+from app import analysis_jobs
+from app import session_cache
+from app import revocation
+from app import geoip
+from app import maintenance
+from app import llm_gateway
+from app.llm_gateway import completion_text
+from app import prompt_budget
+from app.json_stream import JsonArrayParser, item_validator, parse_json_items
+from app.scoring import bm25_scores, term_coverage
+from app.cache_utils import (
+    content_hash,
+    normalize_text,
+    requirements_cache_key,
+    get_cached_requirements,
+    store_requirements,
+    match_cache_key,
+    get_cached_matches,
+    store_matches,
+    trends_input_hash,
+    get_cached_trends,
+    store_trends,
+    invalidate_trends,
+    get_profession_trends,
+    is_profession_trends_fresh,
+    store_profession_trends,
+)
 from uuid import uuid4
-import httpx
 
 # === Database & Auth Imports ===
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_
-from app.auth import hash_password, verify_password
-from app.models import User, LoginEvent, UserSession
-from app.database import get_db
+from sqlalchemy import or_, select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.auth import (
+    hash_password, verify_password, verify_and_update, PasswordHasherBusy, hashing_metrics,
+)
+from app.models import User, LoginEvent, UserSession, Resume, AnalysisJob
+from app.database import get_db, get_async_db, SessionLocal, async_engine
 
 # === JWT Handling ===
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
@@ -59,42 +97,24 @@ conf = ConnectionConfig(
 
 # === Utility Functions ===
 
-def safe_json_parse(content):
-    """Try to safely parse a JSON array/object from AI response text."""
-    try:
-        match = re.search(r'\[\s*{.*}\s*\]', content, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-        return json.loads(content)
-    except Exception:
-        return [{"requirement": "AI Extraction Error", "explanation": content}]
-
-def extract_text_from_pdf(file):
-    """Extract all text from a PDF file (each page)."""
-    pdf_reader = PyPDF2.PdfReader(file)
-    text = ''
-    for page in pdf_reader.pages:
-        text += page.extract_text() or ''
-    return text
-
-def extract_text_from_docx(file):
-    """Extract all text from a Word (.docx) file."""
-    document = Document(file)
-    return '\n'.join([para.text for para in document.paragraphs])
-
-def extract_text(file: UploadFile):
+def safe_json_parse(content, validator=None):
     """
-    Extract text from uploaded file.
-    Supports: PDF (.pdf), Word (.docx), and plain text (.txt).
+    Parse the JSON array of objects in AI response text (prose, code fences and a
+    wrapping object are tolerated). If the reply was cut off, every item completed
+    before the cut is still returned; items failing `validator` are dropped.
     """
-    filename = file.filename.lower()
-    if filename.endswith('.pdf'):
-        return extract_text_from_pdf(file.file)
-    elif filename.endswith('.docx'):
-        return extract_text_from_docx(file.file)
-    else:
-        # Treat everything else as plain text
-        return file.file.read().decode("utf-8", errors="ignore")
+    items, _ = parse_json_items(content, validator)
+    return items or extraction_error_items(content)
+
+def extraction_error_items(content):
+    """Placeholder requirement list for a reply with no usable items."""
+    return [{"requirement": "AI Extraction Error", "explanation": content}]
+
+# Expected item shapes for each kind of LLM reply
+REQUIREMENT_ITEM = item_validator(requirement=str)
+MATCH_ITEM = item_validator(requirement=str, met=(bool, str))
+QA_ITEM = item_validator(question=str, answer=str)
+TREND_ITEM = item_validator(title=str)
 
 def clean_explanation(text):
     """Make AI explanations more readable for users."""
@@ -107,134 +127,491 @@ def clean_explanation(text):
     text = re.sub(r'(?<![.?!])\n', '. ', text)
     return text
 
-async def geo_lookup(ip: str) -> str:
-    """
-    Try to resolve an IP address to a city/region/country using a public GeoIP API.
-
-    - For localhost/private IPs, we call the API without specifying an IP, so it
-      uses the server's public IP (works in dev to show e.g. Winnipeg).
-    - For real public IPs (e.g., behind a proxy with X-Forwarded-For), we look
-      up that exact IP.
-    """
-    # Decide which URL to call on ipapi
-    # Local / private IPs -> call /json/ (use server's external IP)
-    if (
-        not ip
-        or ip in {"localhost", "::1"}
-        or ip.startswith("127.")
-        or ip.startswith("10.")
-        or ip.startswith("192.168.")
-        or ip.startswith("172.16.")
-        or ip.startswith("172.17.")
-        or ip.startswith("172.18.")
-        or ip.startswith("172.19.")
-        or ip.startswith("172.20.")
-        or ip.startswith("172.21.")
-        or ip.startswith("172.22.")
-        or ip.startswith("172.23.")
-        or ip.startswith("172.24.")
-        or ip.startswith("172.25.")
-        or ip.startswith("172.26.")
-        or ip.startswith("172.27.")
-        or ip.startswith("172.28.")
-        or ip.startswith("172.29.")
-        or ip.startswith("172.30.")
-        or ip.startswith("172.31.")
-    ):
-        lookup_url = "https://ipapi.co/json/"
-    else:
-        # Public IP: look up that specific client IP
-        lookup_url = f"https://ipapi.co/{ip}/json/"
-
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            resp = await client.get(lookup_url)
-            if resp.status_code != 200:
-                return "Location unavailable"
-
-            data = resp.json()
-            city = data.get("city")
-            region = data.get("region")
-            country = data.get("country_name")
-
-            parts = [p for p in [city, region, country] if p]
-            if parts:
-                return ", ".join(parts)
-    except Exception:
-        # Fail gracefully if API fails
-        pass
-
-    return "Location unavailable"
-
 # === OPENAI SETUP ===
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=openai_api_key)
+# All chat completions go through app.llm_gateway (rate limits, retries, timeouts, metrics)
 MODEL = "gpt-4.1-nano"
+# Bump whenever the extraction prompt changes so cached requirements are not reused
+REQUIREMENTS_PROMPT_VERSION = "v2"
+# Bump whenever the matching prompt changes so memoized verdicts are not reused
+MATCH_PROMPT_VERSION = "v1"
 
 # === Requirement Extraction Functions ===
 
-def extract_requirements_gpt(job_desc):
-    """Ask OpenAI to extract explicit/implicit requirements from job posting."""
+def build_extraction_messages(job_desc):
+    """Chat messages for requirement extraction (shared by the normal and streamed calls)."""
     system_prompt = (
         "Extract a detailed JSON array of all explicit and implicit job requirements from the following job description. "
         "For each requirement, include the field 'requirement' (a short title), and 'explanation' (concise reason/context for why it's needed). "
         "Only include requirements that could be checked on a resume (e.g., years of experience, education, certifications, security clearance, eligibility, skills, language, work location, schedule, etc). "
         "Format: [{\"requirement\": \"...\", \"explanation\": \"...\"}]"
     )
-    user_prompt = f"Job Description:\n{job_desc}\n\nExtract the requirements as a JSON list."
-    response = client.chat.completions.create(
+    job_text = prompt_budget.clean_job_text(job_desc)
+    prompt_budget.record_savings(
+        "extract_requirements",
+        prompt_budget.count_tokens(job_desc),
+        prompt_budget.count_tokens(job_text),
+    )
+    user_prompt = f"Job Description:\n{job_text}\n\nExtract the requirements as a JSON list."
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+async def extract_requirements_gpt(job_desc):
+    """
+    Ask OpenAI to extract explicit/implicit requirements from job posting.
+    Returns (requirements, complete); complete is False when the reply was cut off
+    (max_tokens) and the list holds only the items that arrived before the cut.
+    """
+    response = await llm_gateway.chat_completion(
+        "extract_requirements",
+        build_extraction_messages(job_desc),
         model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
         temperature=0.2,
         max_tokens=800,
     )
-    requirements = safe_json_parse(response.choices[0].message.content)
+    content = completion_text(response)
+    items, parser = parse_json_items(content, REQUIREMENT_ITEM)
+    complete = parser.complete and response.choices[0].finish_reason != "length"
+    return items or extraction_error_items(content), complete
+
+def is_extraction_error(requirements):
+    """True if parsing fell back to the 'AI Extraction Error' placeholder."""
+    return (
+        not isinstance(requirements, list)
+        or any(r.get("requirement") == "AI Extraction Error" for r in requirements)
+    )
+
+async def get_job_requirements(job_desc):
+    """
+    Cached wrapper around extract_requirements_gpt.
+    Identical postings (after whitespace/case normalization) reuse the stored
+    requirements instead of making another LLM call. Truncated extractions are
+    returned but not cached, so the next request tries again.
+    """
+    key = requirements_cache_key(job_desc, MODEL, REQUIREMENTS_PROMPT_VERSION)
+    cached = await asyncio.to_thread(get_cached_requirements, key)
+    if cached is not None:
+        return cached
+
+    requirements, complete = await extract_requirements_gpt(job_desc)
+    if complete and not is_extraction_error(requirements):
+        await asyncio.to_thread(
+            store_requirements, key, requirements, MODEL, REQUIREMENTS_PROMPT_VERSION
+        )
     return requirements
 
-def match_requirements_gpt(resume_text, requirements):
+async def stream_job_requirements(job_desc):
     """
-    Ask OpenAI to compare the parsed requirements and the user's resume,
-    and return which requirements are clearly met or missing.
+    Streamed variant of get_job_requirements: yields each requirement as soon as
+    its object is complete (a cached list is yielded at once). Complete lists are
+    cached the same way; a reply with no usable items yields the error placeholder.
     """
+    key = requirements_cache_key(job_desc, MODEL, REQUIREMENTS_PROMPT_VERSION)
+    cached = await asyncio.to_thread(get_cached_requirements, key)
+    if cached is not None:
+        for requirement in cached:
+            yield requirement
+        return
+
+    stream = llm_gateway.stream_chat_completion(
+        "extract_requirements_stream",
+        build_extraction_messages(job_desc),
+        model=MODEL,
+        temperature=0.2,
+        max_tokens=800,
+    )
+    parser = JsonArrayParser(REQUIREMENT_ITEM)
+    content, finish_reason = [], None
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        text = choice.delta.content or ""
+        content.append(text)
+        finish_reason = choice.finish_reason or finish_reason
+        for requirement in parser.feed(text):
+            yield requirement
+
+    content = "".join(content)
+    if not parser.items:
+        # Nothing came out of an array; the reply may be a lone object or unusable
+        items, parser = parse_json_items(content, REQUIREMENT_ITEM)
+        for requirement in items or extraction_error_items(content):
+            yield requirement
+    if parser.items and parser.complete and finish_reason != "length":
+        await asyncio.to_thread(
+            store_requirements, key, parser.items, MODEL, REQUIREMENTS_PROMPT_VERSION
+        )
+
+def build_match_messages(resume_text, requirements):
+    """Chat messages for the requirement matcher (shared by the normal and streamed calls)."""
     system_prompt = (
         "You are a helpful HR assistant. For each job requirement below, check if the candidate resume CLEARLY meets the requirement. "
         "For each, output an object: {'requirement': <requirement>, 'met': true/false, 'explanation': <very short explanation>}. "
         "Be strict—if the requirement is not CLEARLY met in the resume, set 'met': false."
     )
-    req_list = [
-        {"requirement": r["requirement"], "explanation": r.get("explanation", "")}
-        for r in requirements
-    ]
+    req_json = prompt_budget.compact_requirements(requirements)
+    # Keep the resume sections that matter for these requirements, within the token budget
+    resume_excerpt = prompt_budget.trim_resume(
+        resume_text,
+        " ".join(f"{r['requirement']} {r.get('explanation', '')}" for r in requirements),
+    )
+    prompt_budget.record_savings(
+        "match_requirements",
+        prompt_budget.count_tokens(resume_text) + prompt_budget.count_tokens(json.dumps(requirements, indent=2)),
+        prompt_budget.count_tokens(resume_excerpt) + prompt_budget.count_tokens(req_json),
+    )
     user_prompt = (
-        f"Job requirements:\n{json.dumps(req_list, indent=2)}\n\n"
-        f"Candidate resume:\n{resume_text}\n\n"
+        f"Job requirements:\n{req_json}\n\n"
+        f"Candidate resume:\n{resume_excerpt}\n\n"
         "Return a JSON array as specified."
     )
-    response = client.chat.completions.create(
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+async def match_requirements_gpt(resume_text, requirements):
+    """
+    Ask OpenAI to compare the parsed requirements and the user's resume,
+    and return which requirements are clearly met or missing.
+    """
+    response = await llm_gateway.chat_completion(
+        "match_requirements",
+        build_match_messages(resume_text, requirements),
+        model=MODEL,
+        temperature=0.2,
+        max_tokens=1800,
+    )
+    match_results = safe_json_parse(completion_text(response), MATCH_ITEM)
+    return match_results
+
+async def stream_match_requirements_gpt(resume_text, requirements):
+    """
+    Streamed variant of match_requirements_gpt: yields each
+    {"requirement", "met", "explanation"} object as soon as it is complete.
+    """
+    stream = llm_gateway.stream_chat_completion(
+        "match_requirements_stream",
+        build_match_messages(resume_text, requirements),
+        model=MODEL,
+        temperature=0.2,
+        max_tokens=1800,
+    )
+    parser = JsonArrayParser(MATCH_ITEM)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        for obj in parser.feed(chunk.choices[0].delta.content or ""):
+            yield obj
+
+async def generate_fit_questions(resume_text, job_text):
+    """
+    Ask OpenAI for context-specific Q&A about the candidate's fit for this job.
+    Independent of requirement extraction/matching, so it can run alongside them.
+    """
+    system_prompt = (
+        "You are a smart job matching assistant. Analyze the following job description and resume. "
+        "1. Suggest up to 5 very relevant, dynamic, and context-specific questions a candidate might want to ask about their fit or preparation for this job (DO NOT use generic questions; infer from the specific job). "
+        "2. For each question, give a clear answer based on the resume and job description. "
+        "Format your answer as a JSON list like this: "
+        '[{\"question\": \"...\", \"answer\": \"...\"}]'
+    )
+    job_excerpt = prompt_budget.clean_job_text(job_text)
+    resume_excerpt = prompt_budget.trim_resume(resume_text, job_excerpt)
+    prompt_budget.record_savings(
+        "fit_questions",
+        prompt_budget.count_tokens(job_text) + prompt_budget.count_tokens(resume_text),
+        prompt_budget.count_tokens(job_excerpt) + prompt_budget.count_tokens(resume_excerpt),
+    )
+    user_prompt = (
+        f"Job Description:\n{job_excerpt}\n\nResume:\n{resume_excerpt}\n\n"
+        "Return only the JSON list."
+    )
+    response = await llm_gateway.chat_completion(
+        "fit_questions",
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
         model=MODEL,
-        messages=[
+        temperature=0.3,
+        max_tokens=700,
+    )
+    return safe_json_parse(completion_text(response), QA_ITEM)
+
+# --- Fused analysis: requirements + verdicts + Q&A in one structured-output call ---
+
+# Opt-in default for analyze_resume_for_job; /upload-resume/ can also choose per request
+FUSED_ANALYSIS_ENABLED = os.getenv("FUSED_ANALYSIS_ENABLED", "False") == "True"
+
+FUSED_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["requirements", "questions"],
+    "properties": {
+        "requirements": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["requirement", "explanation", "met", "verdict"],
+                "properties": {
+                    "requirement": {"type": "string"},
+                    "explanation": {"type": "string"},
+                    "met": {"type": "boolean"},
+                    "verdict": {"type": "string"},
+                },
+            },
+        },
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["question", "answer"],
+                "properties": {
+                    "question": {"type": "string"},
+                    "answer": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+def validate_fused_analysis(parsed):
+    """
+    Check a fused response against FUSED_ANALYSIS_SCHEMA (the API enforces it, but
+    refusals/truncation can still slip through). Raises ValueError if unusable.
+    """
+    if not isinstance(parsed, dict):
+        raise ValueError("fused analysis is not a JSON object")
+    requirements, questions = parsed.get("requirements"), parsed.get("questions")
+    if not isinstance(requirements, list) or not requirements or not isinstance(questions, list):
+        raise ValueError("fused analysis is missing requirements or questions")
+    for r in requirements:
+        if not (
+            isinstance(r, dict)
+            and isinstance(r.get("requirement"), str) and r["requirement"].strip()
+            and isinstance(r.get("explanation"), str)
+            and isinstance(r.get("met"), bool)
+            and isinstance(r.get("verdict"), str)
+        ):
+            raise ValueError(f"invalid requirement item: {r!r}")
+    for q in questions:
+        if not (isinstance(q, dict) and isinstance(q.get("question"), str) and isinstance(q.get("answer"), str)):
+            raise ValueError(f"invalid question item: {q!r}")
+
+async def fused_analysis_gpt(resume_text, job_text):
+    """
+    One round trip instead of extract -> match (+ Q&A): returns
+    (requirements, match_results, ai_suggestions) in the three-call shapes.
+    Raises ValueError when the response does not validate.
+    """
+    system_prompt = (
+        "You are a helpful HR assistant. From the job description, extract all explicit and implicit requirements "
+        "that could be checked on a resume (years of experience, education, certifications, clearance, eligibility, "
+        "skills, language, work location, schedule, etc.), each with a short title and a concise explanation of why it is needed. "
+        "For each requirement decide whether the candidate resume CLEARLY meets it (be strict: if not clearly met, met=false) "
+        "and give a very short verdict. "
+        "Then suggest up to 5 context-specific questions the candidate might ask about their fit or preparation for this job "
+        "(no generic questions), each answered from the resume and job description."
+    )
+    job_excerpt = prompt_budget.clean_job_text(job_text)
+    resume_excerpt = prompt_budget.trim_resume(resume_text, job_excerpt)
+    prompt_budget.record_savings(
+        "fused_analysis",
+        prompt_budget.count_tokens(job_text) + prompt_budget.count_tokens(resume_text),
+        prompt_budget.count_tokens(job_excerpt) + prompt_budget.count_tokens(resume_excerpt),
+    )
+    user_prompt = f"Job Description:\n{job_excerpt}\n\nCandidate resume:\n{resume_excerpt}"
+    response = await llm_gateway.chat_completion(
+        "fused_analysis",
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
+        model=MODEL,
         temperature=0.2,
-        max_tokens=1800,
+        max_tokens=2500,
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "resume_analysis", "strict": True, "schema": FUSED_ANALYSIS_SCHEMA},
+        },
     )
-    match_results = safe_json_parse(response.choices[0].message.content)
-    return match_results
+    try:
+        parsed = json.loads(completion_text(response))
+    except ValueError as e:
+        raise ValueError(f"fused analysis is not valid JSON: {e}")
+    validate_fused_analysis(parsed)
+
+    requirements = [
+        {"requirement": r["requirement"], "explanation": r["explanation"]}
+        for r in parsed["requirements"]
+    ]
+    match_results = [
+        {"requirement": r["requirement"], "met": r["met"], "explanation": r["verdict"]}
+        for r in parsed["requirements"]
+    ]
+    return requirements, match_results, parsed["questions"]
+
+def summarize_match_results(requirements, match_results):
+    """
+    Split matcher output into met/missing requirement lists and build a readable
+    explanation per requirement (extraction context + matcher verdict).
+    Returns (met_requirements, missing_requirements, requirement_explanations).
+    """
+    met_requirements = []
+    missing_requirements = []
+    requirement_explanations = {}
+
+    for r in match_results:
+        req = r["requirement"]
+        orig_expl = next((x.get("explanation") for x in requirements if x["requirement"] == req), "")
+        ai_expl = r.get("explanation", "")
+        explanation = orig_expl
+        if ai_expl:
+            if explanation and not explanation.endswith("."):
+                explanation += "."
+            if explanation:
+                explanation += " "
+            explanation += ai_expl
+        explanation = clean_explanation(explanation)
+        requirement_explanations[req] = explanation
+        if r.get("met") is True or str(r.get("met")).lower() == "true":
+            met_requirements.append(req)
+        else:
+            missing_requirements.append(req)
+
+    return met_requirements, missing_requirements, requirement_explanations
+
+def verdict_event(requirements, verdict):
+    """One verdict formatted like summarize_match_results output (for streaming)."""
+    met, _, explanations = summarize_match_results(requirements, [verdict])
+    return {
+        "requirement": verdict["requirement"],
+        "met": bool(met),
+        "explanation": explanations.get(verdict["requirement"], ""),
+    }
 
 def ai_match_score(resume_text, job_text):
-    """Simple overlap score for resume and job text as a backup."""
-    resume_words = set(re.findall(r'\w+', resume_text.lower()))
-    job_words = set(re.findall(r'\w+', job_text.lower()))
-    overlap = resume_words.intersection(job_words)
-    return len(overlap) / (len(job_words) + 1e-5)
+    """Lexical (BM25) match score for resume vs. job text, 0..1, as a backup to the AI verdicts."""
+    return float(bm25_scores(job_text, [resume_text])[0])
+
+def requirement_coverage(resume_text, requirements):
+    """
+    Fraction of requirement titles whose (normalized) terms all appear in the resume.
+    Cheap local signal used to rank resumes before any LLM call.
+    """
+    if not requirements:
+        return 0.0
+    covered = sum(
+        1 for r in requirements if term_coverage(r.get("requirement") or "", resume_text)
+    )
+    return covered / len(requirements)
+
+def prescore_resumes(resume_texts, job_text, requirements):
+    """
+    Local pre-scores (0..1) for many resumes against one job: BM25 over the whole
+    pool in one pass, blended with requirement coverage and, when the semantic
+    matcher is enabled, embedding similarity.
+    """
+    lexical = bm25_scores(job_text, resume_texts)
+    scores = []
+    for text, lexical_score in zip(resume_texts, lexical):
+        signals = [float(lexical_score), requirement_coverage(text, requirements)]
+        semantic = semantic_match.semantic_match_score(text, requirements)
+        if semantic is not None:
+            signals.append(semantic)
+        scores.append(sum(signals) / len(signals))
+    return scores
+
+def match_memo_keys(resume_text, requirements):
+    """Memo key per requirement (title + explanation) for this resume's content, in order."""
+    resume_hash = content_hash(normalize_text(resume_text))
+    return [
+        match_cache_key(
+            resume_hash, r["requirement"], r.get("explanation") or "", MODEL, MATCH_PROMPT_VERSION
+        )
+        for r in requirements
+    ]
+
+async def recall_matches(resume_text, requirements):
+    """
+    Verdicts already memoized for this resume.
+    Returns (cached_results, unseen_requirements); only the unseen ones need matching.
+    """
+    keys = match_memo_keys(resume_text, requirements)
+    cached = await asyncio.to_thread(get_cached_matches, keys)
+    hits, unseen = [], []
+    for r, key in zip(requirements, keys):
+        verdict = cached.get(key)
+        if verdict is None:
+            unseen.append(r)
+        else:
+            hits.append({"requirement": r["requirement"], **verdict})
+    return hits, unseen
+
+async def remember_matches(resume_text, requirements, match_results):
+    """
+    Memoize LLM verdicts that map back to one of `requirements`. Verdicts come back
+    by title only, so titles shared by requirements with different explanations are skipped.
+    """
+    keys_by_title = {}
+    for r, key in zip(requirements, match_memo_keys(resume_text, requirements)):
+        keys_by_title.setdefault(normalize_text(r["requirement"]), set()).add(key)
+    verdicts = {}
+    for r in match_results:
+        keys = keys_by_title.get(normalize_text(r["requirement"]))
+        if keys is not None and len(keys) == 1:
+            verdicts[next(iter(keys))] = {
+                "met": r.get("met") is True or str(r.get("met")).lower() == "true",
+                "explanation": r.get("explanation") or "",
+            }
+    if verdicts:
+        await asyncio.to_thread(store_matches, verdicts, MODEL, MATCH_PROMPT_VERSION)
+
+def split_locally(resume_text, requirements):
+    """
+    Requirements that are obviously met without the LLM: plain skills the resume
+    names (taxonomy matcher), then close semantic matches. Returns (met_results, remaining).
+    """
+    skill_met, remaining = skill_match.split_present(resume_text, requirements)
+    semantic_met, remaining = semantic_match.split_confident(resume_text, remaining)
+    return skill_met + semantic_met, remaining
+
+async def match_requirements(resume_text, requirements):
+    """
+    Match requirements against the resume. Verdicts memoized for this resume are
+    reused; of the rest, obviously-met ones are resolved locally (split_locally)
+    so only the remainder is sent to match_requirements_gpt.
+    If the LLM call fails, local verdicts are used as a fallback when available.
+    """
+    cached, unseen = await recall_matches(resume_text, requirements)
+    if not unseen:
+        return cached
+    pre_met, remaining = await asyncio.to_thread(split_locally, resume_text, unseen)
+    if not remaining:
+        return cached + pre_met
+    try:
+        llm_results = await match_requirements_gpt(resume_text, remaining)
+    except Exception:
+        fallback = await asyncio.to_thread(
+            semantic_match.semantic_verdicts, resume_text, remaining
+        )
+        if fallback is None:
+            raise
+        return cached + pre_met + fallback
+    await remember_matches(resume_text, remaining, llm_results)
+    return cached + pre_met + llm_results
 
 # === PROFILE TRENDS (AI-ONLY) ===
 
+# Bump whenever the trends prompt changes so cached trends are regenerated
+TRENDS_PROMPT_VERSION = "v1"
+
 def generate_profile_trends(profession, bio):
     """
     Use GPT to generate up to 10 career-related 'trends' for the user
@@ -274,19 +651,22 @@ def generate_profile_trends(profession, bio):
         "Generate the JSON array now."
     )
 
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
+    response = llm_gateway.chat_completion_sync(
+        "profession_trends",
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
+        model=MODEL,
         temperature=0.5,
         max_tokens=600,
     )
 
-    raw = response.choices[0].message.content
-    parsed = safe_json_parse(raw)
+    raw = completion_text(response)
+    return parse_trend_items(safe_json_parse(raw, TREND_ITEM))[:10]
 
+def parse_trend_items(parsed):
+    """Normalize AI trend items into the shape the dashboard expects."""
     if not isinstance(parsed, list):
         return []
 
@@ -309,7 +689,133 @@ def generate_profile_trends(profession, bio):
             "url": url,
         })
 
-    return trends[:10]
+    return trends
+
+def generate_bio_trends(profession, bio, base_trends, limit=4):
+    """
+    Use GPT to add up to `limit` trends specific to the user's bio on top of the
+    shared trends for their profession (which are passed in so they aren't repeated).
+    """
+    system_prompt = (
+        "You are a career and job-search assistant. "
+        "The user already sees the general trends listed below for their profession. "
+        f"Based on their short bio, suggest up to {limit} ADDITIONAL topics, skills, or "
+        "job-market trends that are specific to them. Do not repeat the listed trends.\n\n"
+        "Return ONLY a JSON array, no explanations. Each item must have:\n"
+        "{'title': 'short main text', 'subtitle': '1–2 sentence explanation', "
+        "'tag': '#Something', 'type': 'topic', 'url': null}\n"
+        "You may set 'type' to 'topic', 'skill', or 'career-path'."
+    )
+    user_prompt = (
+        f"User profession: {profession}\n"
+        f"User bio: {bio}\n"
+        f"General trends already shown: {', '.join(t['title'] for t in base_trends) or 'None'}\n\n"
+        "Generate the JSON array now."
+    )
+    response = llm_gateway.chat_completion_sync(
+        "bio_trends",
+        [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        model=MODEL,
+        temperature=0.5,
+        max_tokens=300,
+    )
+    return parse_trend_items(safe_json_parse(completion_text(response), TREND_ITEM))[:limit]
+
+def get_catalog_trends(db, profession):
+    """
+    Shared trends for a profession from the catalog, generating them on a miss.
+    An empty result (failed or unparseable reply) is returned but not stored.
+    """
+    trends = get_profession_trends(db, profession, TRENDS_PROMPT_VERSION)
+    if not trends:
+        trends = generate_profile_trends(profession, "")
+        if trends:
+            store_profession_trends(db, profession, trends, TRENDS_PROMPT_VERSION)
+    return trends
+
+def build_profile_trends(db, profession, bio):
+    """
+    Trends for one user: the shared catalog list for their profession, blended
+    with a few bio-specific items only when the bio is non-empty.
+    """
+    profession = (profession or "").strip()
+    bio = (bio or "").strip()
+    if not profession:
+        return generate_profile_trends("", bio)
+
+    base = get_catalog_trends(db, profession)
+    if not bio:
+        return base
+
+    personal = generate_bio_trends(profession, bio, base)
+    personal_titles = {t["title"].lower() for t in personal}
+    return (personal + [t for t in base if t["title"].lower() not in personal_titles])[:10]
+
+def precompute_profession_trends(db):
+    """
+    Batch job: (re)generate catalog trends for every distinct normalized
+    profession in the users table whose entry is missing or older than
+    TRENDS_CATALOG_MAX_AGE_HOURS. Returns the number of professions generated.
+    """
+    professions = {}
+    for (profession,) in db.query(User.profession).filter(User.profession.isnot(None)).distinct():
+        key = normalize_text(profession)
+        if key:
+            professions.setdefault(key, profession.strip())
+
+    generated = 0
+    for profession in professions.values():
+        if is_profession_trends_fresh(db, profession, TRENDS_PROMPT_VERSION):
+            continue
+        try:
+            trends = generate_profile_trends(profession, "")
+        except Exception as e:
+            print(f"Trends for '{profession}' failed:", e)
+            continue
+        if not trends:
+            # Leave the old entry (or none) so the next run retries
+            print(f"Trends for '{profession}' came back empty")
+            continue
+        store_profession_trends(db, profession, trends, TRENDS_PROMPT_VERSION)
+        generated += 1
+    return generated
+
+_trends_refreshing = set()
+_trends_refreshing_lock = threading.Lock()
+
+def refresh_profile_trends(user_id, profession, bio):
+    """
+    Regenerate and store a user's trends (runs as a background task).
+    At most one refresh per user runs at a time in this process; an empty
+    result is not stored, so the existing entry stays in place.
+    """
+    with _trends_refreshing_lock:
+        if user_id in _trends_refreshing:
+            return
+        _trends_refreshing.add(user_id)
+    db = SessionLocal()
+    try:
+        if (profession or "").strip() and not (bio or "").strip():
+            # Served straight from the shared catalog; just make sure it has an entry
+            get_catalog_trends(db, profession)
+            return
+        trends = build_profile_trends(db, profession, bio)
+        if not trends:
+            # Failed/unparseable reply: keep serving the previous entry
+            print("Profile trends refresh returned nothing for user", user_id)
+            return
+        store_trends(
+            db, user_id, trends_input_hash(profession, bio, TRENDS_PROMPT_VERSION), trends
+        )
+    except Exception as e:
+        print("Profile trends refresh failed:", e)
+    finally:
+        db.close()
+        with _trends_refreshing_lock:
+            _trends_refreshing.discard(user_id)
 
 # ---- Pydantic models for security endpoints ----
 
@@ -317,6 +823,10 @@ class LogoutSessionRequest(BaseModel):
     """Payload to 'log out' a past session by its session_id."""
     session_id: str
 
+class RefreshTokenRequest(BaseModel):
+    """Payload to exchange a refresh token for a new access token."""
+    refresh_token: str
+
 # === FASTAPI APPLICATION SETUP ===
 
 app = FastAPI()
@@ -328,86 +838,832 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Too many logins/password changes queued for bcrypt: ask the client to retry shortly."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again in a moment."},
+        headers={"Retry-After": "2"},
+    )
+
+@app.on_event("startup")
+async def start_background_workers():
+    """
+    Start the background analysis workers, the revocation-set refresher and the
+    table sweeper (auth tables, LLM cache tables), and build the shared
+    skill-taxonomy index.
+    """
+    await asyncio.to_thread(skill_match.load_index)
+    analysis_jobs.start_workers(run_analysis_job)
+    revocation.start_refresh()
+    maintenance.start_sweeper()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop background workers and release worker pools when the server stops."""
+    await analysis_jobs.stop_workers()
+    await revocation.stop_refresh()
+    await maintenance.stop_sweeper()
+    await geoip.close_client()
+    shutdown_extraction_pool()
+    await async_engine.dispose()
+
+# === OPERATIONAL METRICS ===
+
+# Shared secret for GET /metrics/ (sent as the X-Metrics-Token header); unset disables the endpoint
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics/")
+def get_metrics(request: Request):
+    """
+    In-process counters for this worker: LLM calls (latency, retries, throttling,
+    token usage) and prompt budgeting savings per call purpose, and password
+    hashing pool load (queue wait vs. bcrypt time).
+    """
+    supplied = request.headers.get("X-Metrics-Token", "")
+    if not METRICS_TOKEN or not secrets.compare_digest(supplied, METRICS_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "llm": llm_gateway.llm_metrics(),
+        "prompt_budget": prompt_budget.prompt_metrics(),
+        "password_hashing": hashing_metrics(),
+    }
+
+# === AUTH DEPENDENCIES ===
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
+ALGORITHM = "HS256"
+SECRET_KEY = os.getenv("SECRET_KEY", "your-fallback-secret")
+
+
+def credentials_error():
+    return HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def get_token_payload(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Decode and verify the bearer JWT (raises 401 if invalid/expired).
+    FastAPI caches dependencies per request, so endpoints that need claims such
+    as `sid` can depend on this alongside get_current_user without decoding twice.
+    """
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_error()
+
+def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db),
+):
+    """
+    Find the user for a decoded JWT and ensure its session is still active.
+    If the session is revoked or token is invalid/expired, raise 401.
+    """
+    credentials_exception = credentials_error()
+    username: str = payload.get("sub")
+    sid: str | None = payload.get("sid")
+
+    if username is None:
+        raise credentials_exception
+
+    token_type = payload.get("type")
+    if token_type == "refresh":
+        raise credentials_exception
+
+    if token_type == "access" and sid:
+        # Stateless check: valid signature/expiry and not recently revoked
+        if revocation.is_revoked(sid):
+            raise credentials_exception
+        user = session_cache.attach_cached_user(db, payload.get("user_id"))
+        if user is None:
+            user = db.query(User).filter(User.id == payload.get("user_id")).first()
+            if user is None:
+                raise credentials_exception
+            session_cache.remember_user(user)
+        if user.username != username:
+            # username changed since the token was issued; refresh to continue
+            raise credentials_exception
+        return user
+
+    if not sid:
+        # Legacy token without a session id: user lookup only
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise credentials_exception
+        return user
+
+    # Fast path: recently validated session -> no DB round-trip
+    cached = session_cache.get_session(sid)
+    if cached is not None and cached["username"] == username:
+        if not cached["active"]:
+            raise credentials_exception
+        user = session_cache.attach_cached_user(db, cached["user_id"])
+        if user is not None:
+            return user
+
+    # One joined lookup for the user and the state of this session
+    row = (
+        db.query(User, LoginEvent.active)
+        .join(LoginEvent, LoginEvent.user_id == User.id)
+        .filter(User.username == username, LoginEvent.session_id == sid)
+        .first()
+    )
+    if row is None:
+        raise credentials_exception
+    user, active = row
+    session_cache.remember_session(sid, user, active)
+    if not active:
+        # session was revoked / deleted
+        raise credentials_exception
+
+    return user
+
+async def get_current_user_async(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    get_current_user for `async def` endpoints: same checks, on the request's
+    AsyncSession, so the request never holds a sync connection as well.
+    Cached users come back detached; re-fetch with db.get() before modifying.
+    """
+    credentials_exception = credentials_error()
+    username: str = payload.get("sub")
+    sid: str | None = payload.get("sid")
+
+    if username is None:
+        raise credentials_exception
+
+    token_type = payload.get("type")
+    if token_type == "refresh":
+        raise credentials_exception
+
+    if token_type == "access" and sid:
+        # Stateless check: valid signature/expiry and not recently revoked
+        if revocation.is_revoked(sid):
+            raise credentials_exception
+        user_id = payload.get("user_id")
+        user = session_cache.cached_user(user_id)
+        if user is None:
+            user = await db.get(User, user_id) if user_id is not None else None
+            if user is None:
+                raise credentials_exception
+            session_cache.remember_user(user)
+        if user.username != username:
+            raise credentials_exception
+        return user
+
+    if not sid:
+        # Legacy token without a session id: user lookup only
+        user = await db.scalar(select(User).where(User.username == username))
+        if user is None:
+            raise credentials_exception
+        return user
+
+    cached = session_cache.get_session(sid)
+    if cached is not None and cached["username"] == username:
+        if not cached["active"]:
+            raise credentials_exception
+        user = session_cache.cached_user(cached["user_id"])
+        if user is not None:
+            return user
+
+    row = (await db.execute(
+        select(User, LoginEvent.active)
+        .join(LoginEvent, LoginEvent.user_id == User.id)
+        .where(User.username == username, LoginEvent.session_id == sid)
+        .limit(1)
+    )).first()
+    if row is None:
+        raise credentials_exception
+    user, active = row
+    session_cache.remember_session(sid, user, active)
+    if not active:
+        raise credentials_exception
+
+    return user
+
+async def get_optional_user_async(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Like get_current_user_async, but returns None for anonymous requests
+    (endpoints that work both logged-in and logged-out).
+    """
+    if not token:
+        return None
+    return await get_current_user_async(payload=get_token_payload(token), db=db)
+
+
 # === Resume Upload & Analysis Endpoint ===
 
+async def get_library_resume(db: AsyncSession, user: User, resume_id: int) -> Resume:
+    """Fetch a resume from the user's library or raise 404."""
+    saved = await db.scalar(
+        select(Resume).where(Resume.id == resume_id, Resume.user_id == user.id)
+    )
+    if saved is None:
+        raise HTTPException(status_code=404, detail="Resume not found.")
+    return saved
+
+async def analyze_resume_for_job(resume_text, job_text, include_suggestions=True, fused=None):
+    """
+    Full analysis of one resume against one job: requirements (cached) -> match,
+    with the Q&A suggestions generated alongside when requested.
+    With `fused` (default FUSED_ANALYSIS_ENABLED) all of it comes from one
+    structured-output call, falling back to the separate calls if its reply
+    does not validate.
+    """
+    if fused is None:
+        fused = FUSED_ANALYSIS_ENABLED
+    if fused and include_suggestions:
+        try:
+            requirements, match_results, ai_suggestions = await fused_analysis_gpt(resume_text, job_text)
+        except ValueError as e:
+            # Only a reply that fails validation falls back; API errors (already
+            # retried by the gateway) propagate instead of spending three more calls
+            print("Fused analysis invalid, using separate calls:", e)
+        else:
+            return build_analysis_result(
+                resume_text, job_text, requirements, match_results, ai_suggestions
+            )
+
+    async def extract_and_match():
+        reqs = await get_job_requirements(job_text)
+        return reqs, await match_requirements(resume_text, reqs)
+
+    if include_suggestions:
+        # Q&A doesn't depend on the requirements, so run it alongside extract -> match
+        (requirements, match_results), ai_suggestions = await asyncio.gather(
+            extract_and_match(),
+            generate_fit_questions(resume_text, job_text),
+        )
+    else:
+        (requirements, match_results), ai_suggestions = await extract_and_match(), []
+
+    return build_analysis_result(resume_text, job_text, requirements, match_results, ai_suggestions)
+
+def build_analysis_result(resume_text, job_text, requirements, match_results, ai_suggestions):
+    """Assemble the analysis payload returned by /upload-resume/ and friends."""
+    met_requirements, missing_requirements, requirement_explanations = (
+        summarize_match_results(requirements, match_results)
+    )
+    score = ai_match_score(resume_text, job_text)
+
+    return {
+        "scores": [score],
+        "met_requirements": met_requirements,
+        "missing_requirements": missing_requirements,
+        "requirement_explanations": requirement_explanations,
+        "ai_suggestions": ai_suggestions,
+    }
+
+# Reported (422 or as the job error) when a resume hits extraction.EXTRACTION_TIMEOUT
+EXTRACTION_TIMEOUT_DETAIL = "This resume took too long to process."
+
+def analysis_error_response(e):
+    """Analysis payload returned when something fails (same shape as a real result)."""
+    return {
+        "scores": [0.0],
+        "met_requirements": [],
+        "missing_requirements": [],
+        "requirement_explanations": {},
+        "ai_suggestions": [{"question": "Error", "answer": str(e)}],
+    }
+
+def check_resume_source(resume, resume_id, current_user):
+    """Validate that the request names exactly one usable resume source."""
+    if resume_id is not None:
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="Log in to analyze a saved resume.")
+    elif resume is None:
+        raise HTTPException(status_code=400, detail="Upload a resume file or pass a resume_id.")
+
+async def resolve_resume_text(resume, resume_id, current_user, db):
+    """Return resume text from the user's library (by id) or by parsing the uploaded file."""
+    if resume_id is not None:
+        return (await get_library_resume(db, current_user, resume_id)).text
+    return await extract_text_async(resume.filename, await resume.read())
+
 @app.post("/upload-resume/")
 async def upload_resume(
-    resume: UploadFile = File(...),
-    job_description: str = Form(...)
+    resume: UploadFile = File(None),
+    resume_id: int = Form(None),
+    job_description: str = Form(...),
+    fused: Optional[bool] = Form(None),
+    current_user: Optional[User] = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Receive user's resume file and job description,
-    extract requirements and match using AI, return match data.
+    Receive user's resume (a file, or the id of a resume saved in their library)
+    and job description, extract requirements and match using AI, return match data.
+    `fused` overrides FUSED_ANALYSIS_ENABLED for this request (single-call mode).
     """
+    check_resume_source(resume, resume_id, current_user)
+
     try:
-        resume_text = extract_text(resume)
-        job_text = job_description
-
-        requirements = extract_requirements_gpt(job_text)
-        match_results = match_requirements_gpt(resume_text, requirements)
-
-        met_requirements = []
-        missing_requirements = []
-        requirement_explanations = {}
-
-        for r in match_results:
-            req = r["requirement"]
-            orig_expl = next((x.get("explanation") for x in requirements if x["requirement"] == req), "")
-            ai_expl = r.get("explanation", "")
-            explanation = orig_expl
-            if ai_expl:
-                if explanation and not explanation.endswith("."):
-                    explanation += "."
-                if explanation:
-                    explanation += " "
-                explanation += ai_expl
-            explanation = clean_explanation(explanation)
-            requirement_explanations[req] = explanation
-            if r.get("met") is True or str(r.get("met")).lower() == "true":
-                met_requirements.append(req)
-            else:
-                missing_requirements.append(req)
-
-        score = ai_match_score(resume_text, job_text)
-
-        # Extra AI Q&A for user guidance
-        system_prompt = (
-            "You are a smart job matching assistant. Analyze the following job description and resume. "
-            "1. Suggest up to 5 very relevant, dynamic, and context-specific questions a candidate might want to ask about their fit or preparation for this job (DO NOT use generic questions; infer from the specific job). "
-            "2. For each question, give a clear answer based on the resume and job description. "
-            "Format your answer as a JSON list like this: "
-            '[{\"question\": \"...\", \"answer\": \"...\"}]'
+        resume_text = await resolve_resume_text(resume, resume_id, current_user, db)
+        # Give the connection back to the pool before the LLM calls
+        await db.close()
+        return await analyze_resume_for_job(resume_text, job_description, fused=fused)
+    except HTTPException:
+        raise
+    except ExtractionTimeout:
+        raise HTTPException(status_code=422, detail=EXTRACTION_TIMEOUT_DETAIL)
+    except Exception as e:
+        return analysis_error_response(e)
+
+# === Streaming Analysis (Server-Sent Events) ===
+
+def sse_event(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/upload-resume/stream/")
+async def upload_resume_stream(
+    resume: UploadFile = File(None),
+    resume_id: int = Form(None),
+    job_description: str = Form(...),
+    current_user: Optional[User] = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Same analysis as /upload-resume/, streamed as Server-Sent Events so the UI
+    can render each stage as soon as it is ready:
+      started        the resume was received; sent before any parsing or LLM work
+      extracted      one requirement, as soon as extraction produces it
+      requirements   the extracted requirement list
+      requirement    one met/missing verdict (as the matcher streams it)
+      suggestions    the Q&A list (generated concurrently)
+      done           the full result, same shape as /upload-resume/
+      error          something failed; the stream ends after "done"
+    """
+    check_resume_source(resume, resume_id, current_user)
+    # Read the resume now; the request/DB session end before the stream runs
+    if resume_id is not None:
+        resume_text = (await get_library_resume(db, current_user, resume_id)).text
+        resume_name, resume_data = None, None
+    else:
+        resume_text = None
+        resume_name, resume_data = resume.filename, await resume.read()
+    job_text = job_description
+    # The stream can run for many seconds; don't hold a pooled connection for it
+    await db.close()
+
+    async def events():
+        nonlocal resume_text
+        queue = asyncio.Queue()
+        result = analysis_error_response("Analysis did not finish.")
+        result["ai_suggestions"] = []
+
+        async def run_matching():
+            requirements = []
+            async for requirement in stream_job_requirements(job_text):
+                requirements.append(requirement)
+                await queue.put(sse_event("extracted", requirement))
+            await queue.put(sse_event("requirements", {"requirements": requirements}))
+
+            cached, unseen = await recall_matches(resume_text, requirements)
+            pre_met, remaining = await asyncio.to_thread(split_locally, resume_text, unseen)
+            match_results = []
+            for verdict in cached + pre_met:
+                match_results.append(verdict)
+                await queue.put(sse_event("requirement", verdict_event(requirements, verdict)))
+            if remaining:
+                streamed = []
+                async for verdict in stream_match_requirements_gpt(resume_text, remaining):
+                    streamed.append(verdict)
+                    match_results.append(verdict)
+                    await queue.put(sse_event("requirement", verdict_event(requirements, verdict)))
+                await remember_matches(resume_text, remaining, streamed)
+
+            met, missing, explanations = summarize_match_results(requirements, match_results)
+            result.update({
+                "scores": [ai_match_score(resume_text, job_text)],
+                "met_requirements": met,
+                "missing_requirements": missing,
+                "requirement_explanations": explanations,
+            })
+
+        async def run_suggestions():
+            suggestions = await generate_fit_questions(resume_text, job_text)
+            result["ai_suggestions"] = suggestions
+            await queue.put(sse_event("suggestions", {"ai_suggestions": suggestions}))
+
+        async def guarded(stage):
+            try:
+                await stage()
+            except Exception as e:
+                await queue.put(sse_event("error", {"message": str(e)}))
+            finally:
+                await queue.put(None)
+
+        yield sse_event("started", {"filename": resume_name, "resume_id": resume_id})
+        try:
+            if resume_text is None:
+                resume_text = await extract_text_async(resume_name, resume_data)
+        except Exception as e:
+            message = EXTRACTION_TIMEOUT_DETAIL if isinstance(e, ExtractionTimeout) else str(e)
+            yield sse_event("error", {"message": message})
+            yield sse_event("done", result)
+            return
+
+        tasks = [
+            asyncio.create_task(guarded(run_matching)),
+            asyncio.create_task(guarded(run_suggestions)),
+        ]
+        try:
+            running = len(tasks)
+            while running:
+                item = await queue.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+            yield sse_event("done", result)
+        finally:
+            # Client went away mid-stream: stop paying for LLM calls
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# === Batch Analysis: one resume vs. many jobs ===
+
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 20))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+
+@app.post("/upload-resume/batch/")
+async def upload_resume_batch(
+    resume: UploadFile = File(None),
+    resume_id: int = Form(None),
+    job_descriptions: List[str] = Form(...),
+    include_suggestions: bool = Form(False),
+    current_user: Optional[User] = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Analyze one resume against several job descriptions in a single request.
+    The resume is parsed once; jobs are processed concurrently (at most
+    BATCH_CONCURRENCY at a time) and identical postings are only analyzed once.
+    Q&A suggestions are skipped unless include_suggestions is set.
+    Results keep the submitted indices; blank entries get an error result.
+    """
+    check_resume_source(resume, resume_id, current_user)
+    if not any(j and j.strip() for j in job_descriptions):
+        raise HTTPException(status_code=400, detail="Provide at least one job description.")
+    if len(job_descriptions) > BATCH_MAX_JOBS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_JOBS} job descriptions per batch.",
         )
-        user_prompt = (
-            f"Job Description:\n{job_text}\n\nResume:\n{resume_text}\n\n"
-            "Return only the JSON list."
+
+    try:
+        resume_text = await resolve_resume_text(resume, resume_id, current_user, db)
+    except HTTPException:
+        raise
+    except ExtractionTimeout:
+        raise HTTPException(status_code=422, detail=EXTRACTION_TIMEOUT_DETAIL)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read resume: {e}")
+    # Give the connection back to the pool before the LLM calls
+    await db.close()
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def analyze_job(job_text):
+        async with semaphore:
+            try:
+                return await analyze_resume_for_job(
+                    resume_text, job_text, include_suggestions=include_suggestions
+                )
+            except Exception as e:
+                return analysis_error_response(e)
+
+    # Same posting pasted twice -> analyze once, report twice
+    unique_jobs = {}
+    for job_text in job_descriptions:
+        if job_text and job_text.strip():
+            unique_jobs.setdefault(normalize_text(job_text), job_text)
+    keys = list(unique_jobs)
+    analyses = await asyncio.gather(*(analyze_job(unique_jobs[k]) for k in keys))
+    by_key = dict(zip(keys, analyses))
+
+    results = []
+    for i, job_text in enumerate(job_descriptions):
+        if job_text and job_text.strip():
+            results.append({"index": i, **by_key[normalize_text(job_text)]})
+        else:
+            results.append({"index": i, **analysis_error_response("Empty job description.")})
+    return {"results": results}
+
+# === Recruiter Ranking: one job vs. many resumes ===
+
+RANK_MAX_RESUMES = int(os.getenv("RANK_MAX_RESUMES", 300))
+RANK_TOP_K = int(os.getenv("RANK_TOP_K", 10))
+RANK_LLM_CONCURRENCY = int(os.getenv("RANK_LLM_CONCURRENCY", 4))
+
+@app.post("/rank-resumes/")
+async def rank_resumes(
+    job_description: str = Form(...),
+    resumes: List[UploadFile] = File(None),
+    resume_ids: List[int] = Form(None),
+    top_k: int = Form(RANK_TOP_K),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Rank many resumes (uploaded files and/or library resume ids) against one job.
+
+    Requirements are extracted once, every resume gets a cheap local pre-score,
+    and only the top_k candidates are sent to the LLM matcher (bounded concurrency).
+    The response is streamed as newline-delimited JSON events:
+      {"type": "extraction_error", ...}              one per file that could not be parsed
+      {"type": "prefilter", "candidates": [...]}   all parsed resumes, by pre-score
+      {"type": "match", ...}                         one per top-k resume, as it finishes
+      {"type": "ranking", "results": [...]}          final top-k order
+      {"type": "error", "error": "..."}              requirement extraction failed; stream ends
+    """
+    resumes = resumes or []
+    resume_ids = resume_ids or []
+    total = len(resumes) + len(resume_ids)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Upload resumes or pass resume_ids.")
+    if total > RANK_MAX_RESUMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {RANK_MAX_RESUMES} resumes per ranking.",
         )
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,
-            max_tokens=700,
+    top_k = max(1, min(top_k, total))
+
+    # Read everything the stream needs now; the request/DB session end before it runs
+    sources = []
+    for resume_id in resume_ids:
+        saved = await get_library_resume(db, current_user, resume_id)
+        sources.append({"name": saved.filename, "resume_id": saved.id, "text": saved.text})
+    for upload in resumes:
+        sources.append({"name": upload.filename, "resume_id": None, "data": await upload.read()})
+    await db.close()
+
+    async def load_text(source):
+        """(text, None), or (None, error message) if the file could not be parsed."""
+        if "text" in source:
+            return source["text"], None
+        try:
+            return await extract_text_async(source["name"], source["data"]), None
+        except ExtractionTimeout:
+            return None, EXTRACTION_TIMEOUT_DETAIL
+        except Exception as e:
+            return None, str(e) or type(e).__name__
+
+    async def events():
+        try:
+            requirements = await get_job_requirements(job_description)
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+            return
+        loaded = await asyncio.gather(*(load_text(src) for src in sources))
+
+        failed = [i for i, (_, error) in enumerate(loaded) if error is not None]
+        for i in failed:
+            yield json.dumps({
+                "type": "extraction_error",
+                "index": i,
+                "name": sources[i]["name"],
+                "resume_id": sources[i]["resume_id"],
+                "error": loaded[i][1],
+            }) + "\n"
+        parsed = [i for i, (_, error) in enumerate(loaded) if error is None]
+        texts = {i: loaded[i][0] for i in parsed}
+
+        def prefilter():
+            prescores = prescore_resumes([texts[i] for i in parsed], job_description, requirements)
+            candidates = []
+            for i, prescore in zip(parsed, prescores):
+                candidates.append({
+                    "index": i,
+                    "name": sources[i]["name"],
+                    "resume_id": sources[i]["resume_id"],
+                    "prescore": round(prescore, 4),
+                })
+            candidates.sort(key=lambda c: c["prescore"], reverse=True)
+            return candidates
+
+        candidates = await asyncio.to_thread(prefilter)
+        yield json.dumps({"type": "prefilter", "candidates": candidates}) + "\n"
+
+        semaphore = asyncio.Semaphore(RANK_LLM_CONCURRENCY)
+
+        async def match_candidate(candidate):
+            async with semaphore:
+                try:
+                    match_results = await match_requirements(
+                        texts[candidate["index"]], requirements
+                    )
+                    met, missing, _ = summarize_match_results(requirements, match_results)
+                    total_reqs = len(met) + len(missing)
+                    return {
+                        **candidate,
+                        "match_score": round(len(met) / total_reqs, 4) if total_reqs else 0.0,
+                        "met_requirements": met,
+                        "missing_requirements": missing,
+                    }
+                except Exception as e:
+                    return {**candidate, "match_score": 0.0, "error": str(e)}
+
+        ranked = []
+        for finished in asyncio.as_completed([match_candidate(c) for c in candidates[:top_k]]):
+            result = await finished
+            ranked.append(result)
+            yield json.dumps({"type": "match", **result}) + "\n"
+
+        ranked.sort(key=lambda r: (r["match_score"], r["prescore"]), reverse=True)
+        yield json.dumps({"type": "ranking", "results": ranked}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+# === Queued Analysis Jobs (submit + poll) ===
+
+async def run_analysis_job(job):
+    """Worker entry point: extract_text -> requirements -> match for one queued job."""
+    if job.resume_id is not None:
+        db = SessionLocal()
+        try:
+            saved = db.query(Resume).filter(Resume.id == job.resume_id).first()
+            resume_text = saved.text if saved else None
+        finally:
+            db.close()
+        if resume_text is None:
+            raise ValueError("Resume no longer exists.")
+    else:
+        try:
+            resume_text = await extract_text_async(job.resume_filename, job.resume_data)
+        except ExtractionTimeout:
+            raise ValueError(EXTRACTION_TIMEOUT_DETAIL)
+    return await analyze_resume_for_job(resume_text, job.job_description)
+
+@app.post("/analysis-jobs/", status_code=202)
+async def submit_analysis_job(
+    resume: UploadFile = File(None),
+    resume_id: int = Form(None),
+    job_description: str = Form(...),
+    current_user: Optional[User] = Depends(get_optional_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Queue a resume analysis and return a job_id immediately.
+    Poll GET /analysis-jobs/{job_id} for the result.
+    Returns 503 (with Retry-After) when the queue is full.
+    """
+    check_resume_source(resume, resume_id, current_user)
+    job_fields = {
+        "job_description": job_description,
+        "user_id": current_user.id if current_user else None,
+    }
+    if resume_id is not None:
+        job_fields["resume_id"] = (await get_library_resume(db, current_user, resume_id)).id
+    else:
+        job_fields["resume_filename"] = resume.filename
+        job_fields["resume_data"] = await resume.read()
+
+    try:
+        job_id = await analysis_jobs.submit_job(**job_fields)
+    except analysis_jobs.QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="The analysis queue is full. Please try again shortly.",
+            headers={"Retry-After": "10"},
         )
-        ai_suggestions = safe_json_parse(response.choices[0].message.content)
 
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    current_user: Optional[User] = Depends(get_optional_user_async),
+):
+    """Status of a queued analysis; includes the result once it has succeeded."""
+    job = await asyncio.to_thread(analysis_jobs.get_job, job_id)
+    if job is None or (
+        job.user_id is not None and (current_user is None or current_user.id != job.user_id)
+    ):
+        raise HTTPException(status_code=404, detail="Analysis job not found.")
+
+    response = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "created_at": job.created_at.isoformat() + "Z",
+    }
+    if job.status == "queued":
+        response["queue_depth"] = await asyncio.to_thread(analysis_jobs.queue_depth)
+    elif job.status == "succeeded":
+        response["result"] = json.loads(job.result)
+    elif job.status == "failed":
+        response["result"] = analysis_error_response(job.error)
+    return response
+
+# === RESUME LIBRARY ENDPOINTS ===
+
+@app.post("/resumes/")
+async def save_resume(
+    resume: UploadFile = File(...),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Save a resume to the user's library. The text is extracted once here;
+    uploading the exact same file again returns the existing entry without re-parsing.
+    """
+    data = await resume.read()
+    file_hash = content_hash(data)
+
+    existing = await db.scalar(
+        select(Resume).where(Resume.user_id == current_user.id, Resume.content_hash == file_hash)
+    )
+    if existing:
         return {
-            "scores": [score],
-            "met_requirements": met_requirements,
-            "missing_requirements": missing_requirements,
-            "requirement_explanations": requirement_explanations,
-            "ai_suggestions": ai_suggestions,
-        }
-    except Exception as e:
-        return {
-            "scores": [0.0],
-            "met_requirements": [],
-            "missing_requirements": [],
-            "requirement_explanations": {},
-            "ai_suggestions": [{"question": "Error", "answer": str(e)}],
+            "id": existing.id,
+            "filename": existing.filename,
+            "created_at": existing.created_at.isoformat() + "Z",
+            "duplicate": True,
         }
+    # Give the connection back to the pool while the file is parsed
+    await db.close()
+
+    try:
+        text = await extract_text_async(resume.filename, data)
+    except ExtractionTimeout:
+        raise HTTPException(status_code=422, detail=EXTRACTION_TIMEOUT_DETAIL)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Could not read this resume file.")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from this resume.")
+
+    saved = Resume(
+        user_id=current_user.id,
+        filename=resume.filename or "resume",
+        content_hash=file_hash,
+        text=text,
+    )
+    db.add(saved)
+    try:
+        await db.commit()
+        await db.refresh(saved)
+    except IntegrityError:
+        # Same file saved concurrently from another request
+        await db.rollback()
+        saved = await db.scalar(
+            select(Resume).where(Resume.user_id == current_user.id, Resume.content_hash == file_hash)
+        )
+
+    return {
+        "id": saved.id,
+        "filename": saved.filename,
+        "created_at": saved.created_at.isoformat() + "Z",
+        "duplicate": False,
+    }
+
+@app.get("/resumes/")
+def list_resumes(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """List the resumes saved in the user's library (newest first)."""
+    rows = (
+        db.query(Resume.id, Resume.filename, Resume.created_at)
+        .filter(Resume.user_id == current_user.id)
+        .order_by(Resume.created_at.desc())
+        .all()
+    )
+    return {
+        "resumes": [
+            {"id": r.id, "filename": r.filename, "created_at": r.created_at.isoformat() + "Z"}
+            for r in rows
+        ]
+    }
+
+@app.delete("/resumes/{resume_id}")
+async def delete_resume(
+    resume_id: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Remove a resume from the user's library."""
+    saved = await get_library_resume(db, current_user, resume_id)
+    await db.execute(delete(AnalysisJob).where(AnalysisJob.resume_id == saved.id))
+    await db.delete(saved)
+    await db.commit()
+    return {"ok": True}
 
 # === USER REGISTRATION ENDPOINT ===
 
@@ -457,51 +1713,123 @@ def register_user(
         "last_name": new_user.last_name,
     }
 
+# === TOKENS: short-lived access token + refresh token per session ===
+
+def create_access_token(user, session_id):
+    """
+    Access token valid for ACCESS_TOKEN_MINUTES. It is checked without a DB
+    query (signature + expiry + in-memory revocation set).
+    """
+    payload = {
+        "sub": user.username,
+        "user_id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "sid": session_id,  # <- links the token to its user_sessions / login_events row
+        "type": "access",
+        "exp": datetime.utcnow() + timedelta(minutes=revocation.ACCESS_TOKEN_MINUTES),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_refresh_token(user, session_id, expires_at):
+    """Refresh token for the session; only accepted by /token/refresh/."""
+    payload = {
+        "sub": user.username,
+        "user_id": user.id,
+        "sid": session_id,
+        "type": "refresh",
+        "exp": expires_at,
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+@app.post("/token/refresh/")
+def refresh_access_token(body: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token.
+    The session must still exist, be unrevoked and unexpired in user_sessions.
+    """
+    invalid = HTTPException(
+        status_code=401,
+        detail="Session expired. Please log in again.",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(body.refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid
+    if payload.get("type") != "refresh" or not payload.get("sid"):
+        raise invalid
+
+    row = (
+        db.query(User, UserSession)
+        .join(UserSession, UserSession.user_id == User.id)
+        .filter(
+            UserSession.session_id == payload["sid"],
+            User.id == payload.get("user_id"),
+        )
+        .first()
+    )
+    if row is None:
+        raise invalid
+    user, user_session = row
+    if user_session.revoked or (
+        user_session.expires_at and user_session.expires_at < datetime.utcnow()
+    ):
+        raise invalid
+
+    return {
+        "access_token": create_access_token(user, user_session.session_id),
+        "token_type": "bearer",
+        "expires_in": revocation.ACCESS_TOKEN_MINUTES * 60,
+        "username": user.username,
+        "email": user.email,
+    }
+
 # === USER LOGIN ENDPOINT ===
 
 @app.post("/login/")
 async def login(
     request: Request,
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     remember: bool = Form(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Login with either username or email.
     Returns a JWT token and basic user info on success.
-    Also records a login event (active session with session_id).
+    Also records a login event (active session with session_id); its location
+    is resolved in the background once the response has been sent.
     """
-    user = db.query(User).filter(
-        or_(
-            User.email == form_data.username,
-            User.username == form_data.username,
+    user = await db.scalar(
+        select(User).where(
+            or_(
+                User.email == form_data.username,
+                User.username == form_data.username,
+            )
         )
-    ).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    )
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect username/email or password")
+    # bcrypt runs on the hashing pool so this await does not block other requests
+    password_ok, new_hash = await verify_and_update(form_data.password, user.hashed_password)
+    if not password_ok:
+        raise HTTPException(status_code=401, detail="Incorrect username/email or password")
+    if new_hash:
+        # Stored hash used an older cost factor; upgrade it now that we know the password
+        user.hashed_password = new_hash
 
-    SECRET_KEY = os.getenv("SECRET_KEY", "your-fallback-secret")
-    ALGORITHM = "HS256"
-
-    # --- create session id + token expiry ---
+    # --- create session id + session expiry ---
     session_id = secrets.token_urlsafe(32)
 
-    # short vs long expiry (you can tweak durations)
+    # short vs long session (you can tweak durations); the refresh token lives this long
     if remember:
-        exp = datetime.utcnow() + timedelta(days=30)
+        session_expires = datetime.utcnow() + timedelta(days=30)
     else:
-        exp = datetime.utcnow() + timedelta(days=1)
+        session_expires = datetime.utcnow() + timedelta(days=1)
 
-    payload = {
-        "sub": user.username,
-        "user_id": user.id,
-        "email": user.email,
-        "username": user.username,
-        "sid": session_id,  # <- important: link JWT to a login_events row
-        "exp": exp,
-    }
-
-    token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+    access_token = create_access_token(user, session_id)
+    refresh_token = create_refresh_token(user, session_id, session_expires)
 
     # --- capture client info ---
     x_forwarded_for = request.headers.get("x-forwarded-for")
@@ -511,23 +1839,35 @@ async def login(
         client_ip = request.client.host if request.client else "Unknown"
 
     user_agent = request.headers.get("user-agent", "Unknown device")
-    location = await geo_lookup(client_ip)
 
     # --- store as an ACTIVE session in login_events ---
     login_event = LoginEvent(
         user_id=user.id,
         ip=client_ip,
         user_agent=user_agent,
-        location=location,
         session_id=session_id,
         active=True,
     )
     db.add(login_event)
-    db.commit()
+
+    # --- session store consulted by /token/refresh/ ---
+    db.add(UserSession(
+        user_id=user.id,
+        session_id=session_id,
+        expires_at=session_expires,
+        ip=client_ip,
+        user_agent=user_agent,
+    ))
+    await db.commit()
+
+    # GeoIP lookup can take a network round trip; fill location in after responding
+    background_tasks.add_task(geoip.resolve_login_location, session_id, client_ip)
 
     return {
-        "access_token": token,
+        "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
+        "expires_in": revocation.ACCESS_TOKEN_MINUTES * 60,
         "user_id": user.id,
         "username": user.username,
         "email": user.email,
@@ -535,54 +1875,6 @@ async def login(
 
 # === JWT-Protected User Info Endpoint ===
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-ALGORITHM = "HS256"
-SECRET_KEY = os.getenv("SECRET_KEY", "your-fallback-secret")
-
-
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
-    """
-    Decode JWT, find user, and ensure the associated login_events row is still active.
-    If the session is revoked or token is invalid/expired, raise 401.
-    """
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        sid: str | None = payload.get("sid")
-
-        if username is None:
-            raise credentials_exception
-
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            raise credentials_exception
-
-        # If we have a session id, make sure this session is still active
-        if sid:
-            session_row = (
-                db.query(LoginEvent)
-                .filter(
-                    LoginEvent.user_id == user.id,
-                    LoginEvent.session_id == sid,
-                )
-                .first()
-            )
-            if session_row is None or not session_row.active:
-                # session was revoked / deleted
-                raise credentials_exception
-
-        return user
-    except JWTError:
-        raise credentials_exception
-
 @app.get("/me/")
 def read_users_me(current_user: User = Depends(get_current_user)):
     """Get details about the currently logged-in user (JWT required)."""
@@ -602,15 +1894,39 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 # --- PROFILE TRENDS ENDPOINT ---
 
 @app.get("/profile/trends/")
-def get_profile_trends(current_user: User = Depends(get_current_user)):
+def get_profile_trends(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     Return AI-generated 'trends for you' based on the user's profession and bio.
+    Users without a bio get the shared per-profession catalog list directly.
+    Otherwise the blended list is served from the per-user cache; a stale entry
+    is returned immediately and refreshed in the background, so only the very
+    first load waits on the LLM.
     """
     profession = current_user.profession or ""
     bio = current_user.bio or ""
 
+    if profession.strip() and not bio.strip():
+        try:
+            return {"trends": get_catalog_trends(db, profession)}
+        except Exception:
+            return {"trends": []}
+
+    input_hash = trends_input_hash(profession, bio, TRENDS_PROMPT_VERSION)
+
+    cached, fresh = get_cached_trends(db, current_user.id, input_hash)
+    if cached is not None:
+        if not fresh:
+            background_tasks.add_task(refresh_profile_trends, current_user.id, profession, bio)
+        return {"trends": cached}
+
     try:
-        trends = generate_profile_trends(profession, bio)
+        trends = build_profile_trends(db, profession, bio)
+        if trends:
+            store_trends(db, current_user.id, input_hash, trends)
     except Exception:
         trends = []
 
@@ -622,12 +1938,12 @@ def get_profile_trends(current_user: User = Depends(get_current_user)):
 async def request_password_reset(
     background_tasks: BackgroundTasks,
     email: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generates a secure password reset token for the given email and sends it as a reset link via email.
     """
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found with this email.")
     try:
@@ -637,7 +1953,7 @@ async def request_password_reset(
         raise HTTPException(status_code=400, detail=str(e))
 
     user.generate_reset_token(expires_in=3600)  # 1 hour expiry
-    db.commit()
+    await db.commit()
 
     # Password reset link
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
@@ -706,6 +2022,7 @@ def reset_password(
 # --- PROFILE UPDATE ENDPOINT ---
 @app.patch("/profile/update/")
 def update_profile(
+    background_tasks: BackgroundTasks,
     first_name: str = Form(None),
     last_name: str = Form(None),
     email: str = Form(None),
@@ -724,8 +2041,20 @@ def update_profile(
         current_user.profession = profession.strip()
     if bio is not None:
         current_user.bio = bio.strip()
+
+    # Trends depend on profession/bio: drop the cached list and rebuild it in the background
+    profile_changed = profession is not None or bio is not None
+    if profile_changed:
+        invalidate_trends(db, current_user.id)
     db.commit()
     db.refresh(current_user)
+    if profile_changed:
+        background_tasks.add_task(
+            refresh_profile_trends,
+            current_user.id,
+            current_user.profession or "",
+            current_user.bio or "",
+        )
     return {"ok": True}
 
 # --- PROFILE IMAGE UPLOAD ENDPOINT ---
@@ -733,8 +2062,8 @@ def update_profile(
 @app.post("/upload-profile-image/")
 async def upload_profile_image(
     image: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Uploads a profile image for the authenticated user, stores it in S3, and saves the URL in the database.
@@ -748,14 +2077,14 @@ async def upload_profile_image(
     filename = f"user_{current_user.id}_{uuid4().hex}.{image.filename.split('.')[-1]}"
 
     # Upload to S3
-    s3_url = upload_file_to_s3(image, filename=filename, folder="avatars/")
+    s3_url = await asyncio.to_thread(upload_file_to_s3, image, filename=filename, folder="avatars/")
     if not s3_url:
         raise HTTPException(status_code=500, detail="Failed to upload image to S3")
 
     # Update the user's profile_image_url in the database
-    current_user.profile_image_url = s3_url
-    db.commit()
-    db.refresh(current_user)
+    user = await db.get(User, current_user.id)
+    user.profile_image_url = s3_url
+    await db.commit()
 
     return {"ok": True, "profile_image_url": s3_url}
 
@@ -774,8 +2103,8 @@ async def update_account(
     background_tasks: BackgroundTasks,
     username: str = Form(None),
     email: str = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update username and/or primary email.
@@ -783,32 +2112,29 @@ async def update_account(
     - If email changed, mark as unverified.
       The user must click "Send verification code" separately to receive a code.
     """
+    user = await db.get(User, current_user.id)
     email_changed = False
 
     # --- Username update ---
     if username is not None:
         new_username = username.strip()
-        if new_username and new_username != current_user.username:
-            existing_user = (
-                db.query(User)
-                .filter(User.username == new_username, User.id != current_user.id)
-                .first()
+        if new_username and new_username != user.username:
+            existing_user = await db.scalar(
+                select(User.id).where(User.username == new_username, User.id != user.id)
             )
             if existing_user:
                 raise HTTPException(
                     status_code=400,
                     detail="This username is already taken. Please choose another.",
                 )
-            current_user.username = new_username
+            user.username = new_username
 
     # --- Email update ---
     if email is not None:
         new_email = email.strip().lower()
-        if new_email and new_email != current_user.email:
-            existing_email = (
-                db.query(User)
-                .filter(User.email == new_email, User.id != current_user.id)
-                .first()
+        if new_email and new_email != user.email:
+            existing_email = await db.scalar(
+                select(User.id).where(User.email == new_email, User.id != user.id)
             )
             if existing_email:
                 raise HTTPException(
@@ -823,61 +2149,61 @@ async def update_account(
                 raise HTTPException(status_code=400, detail=str(e))
 
             # apply new email + mark as unverified, clear any previous code
-            current_user.email = new_email
+            user.email = new_email
             email_changed = True
 
             # these attrs need to exist on your User model
-            current_user.email_verified = False
-            current_user.email_verification_code = None
-            current_user.email_verification_expires_at = None
+            user.email_verified = False
+            user.email_verification_code = None
+            user.email_verification_expires_at = None
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    session_cache.invalidate_user(user.id)
 
     return {
         "ok": True,
         "email_changed": email_changed,
-        "email_verified": bool(getattr(current_user, "email_verified", False)),
+        "email_verified": bool(getattr(user, "email_verified", False)),
     }
 
 @app.post("/account/send-verification/")
 async def send_verification_email(
     background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Send / resend a 6-digit verification code to the user's current primary email.
     Can be used even if they didn't just change the email.
     """
-    email = (current_user.email or "").strip().lower()
+    user = await db.get(User, current_user.id)
+    email = (user.email or "").strip().lower()
     if not email:
         raise HTTPException(status_code=400, detail="No primary email on file.")
 
     # Optional: block resends if already verified
-    if getattr(current_user, "email_verified", False):
+    if getattr(user, "email_verified", False):
         raise HTTPException(status_code=400, detail="Email is already verified.")
 
     # generate verification code – use model helper if present
-    if hasattr(current_user, "generate_email_verification_code"):
-        code = current_user.generate_email_verification_code(expires_in_minutes=20)
+    if hasattr(user, "generate_email_verification_code"):
+        code = user.generate_email_verification_code(expires_in_minutes=20)
     else:
         # Fallback: simple 6-digit code
         code = f"{secrets.randbelow(1_000_000):06d}"
-        current_user.email_verification_code = code
-        current_user.email_verification_expires_at = datetime.utcnow() + timedelta(
+        user.email_verification_code = code
+        user.email_verification_expires_at = datetime.utcnow() + timedelta(
             minutes=20
         )
-        current_user.email_verified = False
+        user.email_verified = False
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
 
     fm = FastMail(conf)
     message = MessageSchema(
         subject="Verify your email - TalentMatch",
         recipients=[email],
-        body=f"""Hi {current_user.username},
+        body=f"""Hi {user.username},
 
 Here is your TalentMatch email verification code:
 
@@ -967,47 +2293,70 @@ def change_password(
 
     return {"ok": True, "message": "Password changed successfully."}
 
-# --- SECURITY: Recent login activity (stub) ---
+# --- SECURITY: Recent login activity (keyset-paginated) ---
+
+LOGIN_ACTIVITY_PAGE_SIZE = 20
+LOGIN_ACTIVITY_MAX_PAGE_SIZE = 100
+
+def encode_activity_cursor(event):
+    """Opaque cursor pointing just past `event` in (timestamp, id) DESC order."""
+    raw = f"{event.timestamp.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_activity_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, event_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(event_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
 
 @app.get("/account/login-activity/")
 async def get_login_activity(
-    request: Request,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    limit: int = LOGIN_ACTIVITY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user_async),
+    token_payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Return recent *active* login sessions for the user.
+    Return recent *active* login sessions for the user, newest first, one page at a time.
     Only login_events rows with active = True are shown.
     Very old sessions are filtered out by timestamp.
+    Pass the returned next_cursor as `cursor` to get the following page (null on the last one).
     """
-    # Get current session id from the Authorization header
-    auth_header = request.headers.get("authorization") or request.headers.get("Authorization")
-    current_sid = None
-    if auth_header and auth_header.lower().startswith("bearer "):
-        raw_token = auth_header.split(" ", 1)[1]
-        try:
-            payload = jwt.decode(raw_token, SECRET_KEY, algorithms=[ALGORITHM])
-            current_sid = payload.get("sid")
-        except JWTError:
-            current_sid = None
+    # Same decoded token get_current_user used (cached per request, not decoded again)
+    current_sid = token_payload.get("sid")
+    limit = max(1, min(limit, LOGIN_ACTIVITY_MAX_PAGE_SIZE))
 
     now = datetime.utcnow()
     # treat sessions older than 30 days as "expired" for display purposes
     cutoff = now - timedelta(days=30)
 
-    active_events = (
-        db.query(LoginEvent)
-        .filter(
+    query = (
+        select(LoginEvent)
+        .where(
             LoginEvent.user_id == current_user.id,
             LoginEvent.active == True,          # only active sessions
             LoginEvent.timestamp >= cutoff,     # hide very old ones
         )
-        .order_by(LoginEvent.timestamp.desc())
-        .all()
+        # Walks ix_login_events_user_active_timestamp_id in index order
+        .order_by(LoginEvent.timestamp.desc(), LoginEvent.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        after_timestamp, after_id = decode_activity_cursor(cursor)
+        query = query.where(or_(
+            LoginEvent.timestamp < after_timestamp,
+            (LoginEvent.timestamp == after_timestamp) & (LoginEvent.id < after_id),
+        ))
+
+    page = (await db.scalars(query)).all()
+    has_more = len(page) > limit
+    page = page[:limit]
 
     events = []
-    for ev in active_events:
+    for ev in page:
         events.append({
             "timestamp": ev.timestamp.isoformat() + "Z",
             "ip": ev.ip,
@@ -1017,7 +2366,11 @@ async def get_login_activity(
             "session_id": ev.session_id,
         })
 
-    return {"events": events}
+    return {
+        "events": events,
+        "current_session_id": current_sid,
+        "next_cursor": encode_activity_cursor(page[-1]) if has_more else None,
+    }
 
 
 # --- SECURITY: 'Log out' a past session (history only) ---
@@ -1048,7 +2401,13 @@ def logout_session(
         return {"ok": True, "message": "Session already logged out."}
 
     session_row.active = False
+    db.query(UserSession).filter(
+        UserSession.user_id == current_user.id,
+        UserSession.session_id == body.session_id,
+    ).update({"revoked": True, "revoked_at": datetime.utcnow()}, synchronize_session=False)
     db.commit()
+    session_cache.invalidate_session(body.session_id)
+    revocation.revoke(body.session_id)
 
     return {"ok": True, "message": "Session logged out."}
 
@@ -1065,10 +2424,16 @@ def logout_all_sessions(
     """
     # Revoke all rows in user_sessions for this user (if table used)
     # Note: UserSession model uses 'revoked' flag instead of 'active'
+    live_sids = [
+        sid for (sid,) in db.query(UserSession.session_id).filter(
+            UserSession.user_id == current_user.id,
+            UserSession.revoked == False,
+        )
+    ]
     (
         db.query(UserSession)
-        .filter(UserSession.user_id == current_user.id)
-        .update({"revoked": True}, synchronize_session=False)
+        .filter(UserSession.user_id == current_user.id, UserSession.revoked == False)
+        .update({"revoked": True, "revoked_at": datetime.utcnow()}, synchronize_session=False)
     )
 
     # Optional: also mark related login_events as inactive, if you use that flag
@@ -1077,6 +2442,9 @@ def logout_all_sessions(
     )
 
     db.commit()
+    # Bulk update bypasses ORM events, so evict this user's cached sessions explicitly
+    session_cache.invalidate_user(current_user.id)
+    revocation.revoke(*live_sids)
     return {"ok": True, "message": "All sessions logged out."}
 
 @app.delete("/account/delete/")
@@ -1090,6 +2458,25 @@ def delete_account(
     ('Are you sure? This action cannot be undone.')
     before calling this endpoint.
     """
+    db.query(AnalysisJob).filter(AnalysisJob.user_id == current_user.id).delete(
+        synchronize_session=False
+    )
+    invalidate_trends(db, current_user.id)
+    db.query(Resume).filter(Resume.user_id == current_user.id).delete(
+        synchronize_session=False
+    )
+    user_id = current_user.id
+    session_ids = [
+        sid for (sid,) in db.query(UserSession.session_id).filter(UserSession.user_id == user_id)
+    ]
+    db.query(UserSession).filter(UserSession.user_id == user_id).delete(
+        synchronize_session=False
+    )
+    db.query(LoginEvent).filter(LoginEvent.user_id == user_id).delete(
+        synchronize_session=False
+    )
     db.delete(current_user)
     db.commit()
+    session_cache.invalidate_user(user_id)
+    revocation.revoke(*session_ids)
     return {"ok": True, "message": "Account deleted."}
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app.cache_utils import prune_match_cache, prune_requirement_cache
+from app.database import SessionLocal
+from app.models import LoginEvent, User, UserSession
+
+# --- Periodic cleanup of auth tables (login_events, user_sessions, one-time codes)
+#     and the LLM cache tables (expiry and row caps, kept off the request path) ---
+
+# How often the sweeper runs
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", 3600))
+
+# Logged-out login_events rows are kept this long for the account's history, then deleted
+LOGIN_EVENT_INACTIVE_RETENTION_DAYS = int(os.getenv("LOGIN_EVENT_INACTIVE_RETENTION_DAYS", 7))
+
+# Any login_events row older than this is deleted (longest session is 30 days)
+LOGIN_EVENT_MAX_AGE_DAYS = int(os.getenv("LOGIN_EVENT_MAX_AGE_DAYS", 35))
+
+# user_sessions rows are deleted this long after they expired or were revoked
+SESSION_RETENTION_DAYS = int(os.getenv("SESSION_RETENTION_DAYS", 1))
+
+# Rows deleted per transaction, so a large backlog never holds long locks
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", 1000))
+
+_sweeper_task = None
+
+
+def _delete_in_batches(model, *criteria):
+    """Delete rows of `model` matching `criteria`, MAINTENANCE_BATCH_SIZE ids per commit."""
+    total = 0
+    while True:
+        db = SessionLocal()
+        try:
+            ids = [
+                row_id for (row_id,) in db.query(model.id)
+                .filter(*criteria)
+                .limit(MAINTENANCE_BATCH_SIZE)
+            ]
+            if not ids:
+                return total
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        total += len(ids)
+        if len(ids) < MAINTENANCE_BATCH_SIZE:
+            return total
+
+def purge_login_events():
+    """Delete logged-out events past their retention and anything older than the max age."""
+    now = datetime.utcnow()
+    return _delete_in_batches(
+        LoginEvent,
+        or_(
+            (LoginEvent.active == False)
+            & (LoginEvent.timestamp < now - timedelta(days=LOGIN_EVENT_INACTIVE_RETENTION_DAYS)),
+            LoginEvent.timestamp < now - timedelta(days=LOGIN_EVENT_MAX_AGE_DAYS),
+        ),
+    )
+
+def purge_user_sessions():
+    """Delete sessions whose refresh token expired, or that were revoked, over a day ago."""
+    cutoff = datetime.utcnow() - timedelta(days=SESSION_RETENTION_DAYS)
+    return _delete_in_batches(
+        UserSession,
+        or_(
+            UserSession.expires_at < cutoff,
+            UserSession.revoked_at < cutoff,
+        ),
+    )
+
+def clear_expired_user_codes():
+    """Null out password reset tokens and email verification codes that have expired."""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        resets = db.query(User).filter(
+            User.reset_token.isnot(None),
+            User.reset_token_expiration < now,
+        ).update(
+            {User.reset_token: None, User.reset_token_expiration: None},
+            synchronize_session=False,
+        )
+        codes = db.query(User).filter(
+            User.email_verification_code.isnot(None),
+            User.email_verification_expires_at < now,
+        ).update(
+            {User.email_verification_code: None, User.email_verification_expires_at: None},
+            synchronize_session=False,
+        )
+        db.commit()
+        return resets + codes
+    finally:
+        db.close()
+
+def run_maintenance():
+    """One full sweep; returns how many rows each step touched."""
+    return {
+        "login_events": purge_login_events(),
+        "user_sessions": purge_user_sessions(),
+        "user_codes": clear_expired_user_codes(),
+        "requirement_cache": prune_requirement_cache(),
+        "match_cache": prune_match_cache(),
+    }
+
+async def _sweeper_loop():
+    while True:
+        try:
+            await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            print("Table maintenance failed:", e)
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+def start_sweeper():
+    """Start the periodic sweep on the running event loop."""
+    global _sweeper_task
+    if _sweeper_task is None:
+        _sweeper_task = asyncio.create_task(_sweeper_loop())
+
+async def stop_sweeper():
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        await asyncio.gather(_sweeper_task, return_exceptions=True)
+        _sweeper_task = None
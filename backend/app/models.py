@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, UniqueConstraint, LargeBinary, Index
 from app.database import Base
 from datetime import datetime, timedelta
 import secrets
@@ -59,6 +59,10 @@ class User(Base):
 
 class LoginEvent(Base):
     __tablename__ = "login_events"
+    __table_args__ = (
+        # Serves "active sessions for this user, newest first" (keyset-paginated login activity)
+        Index("ix_login_events_user_active_timestamp_id", "user_id", "active", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
@@ -91,11 +95,154 @@ class UserSession(Base):
     session_id = Column(String, unique=True, index=True, nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    expires_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
 
     revoked = Column(Boolean, default=False, nullable=False)
+    # When the session was revoked (lets servers load only *recent* revocations)
+    revoked_at = Column(DateTime, nullable=True, index=True)
 
     # Optional device info
     ip = Column(String(45))
     user_agent = Column(Text)
-    location = Column(String(255))
\ No newline at end of file
+    location = Column(String(255))
+
+class RequirementCache(Base):
+    """
+    Durable cache of extract_requirements_gpt results, shared by all workers.
+    Keyed by a hash of the normalized job text + model + prompt version.
+    """
+    __tablename__ = "requirement_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+
+    # JSON-encoded list of {"requirement": ..., "explanation": ...}
+    requirements = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class RequirementMatchCache(Base):
+    """
+    Memoized match_requirements_gpt verdicts, one row per (resume, requirement).
+    Keyed by a hash of the resume content + normalized requirement text and
+    explanation + model + prompt version, so the same requirement seen in another
+    posting is not re-judged.
+    """
+    __tablename__ = "requirement_match_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+
+    met = Column(Boolean, nullable=False)
+    explanation = Column(Text, nullable=False, default="")
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class Resume(Base):
+    """
+    A resume saved to the user's library: parsed once on upload, then
+    analyzed any number of times by id without re-uploading or re-parsing.
+    """
+    __tablename__ = "resumes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "content_hash", name="uq_resumes_user_content_hash"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+
+    filename = Column(String(255), nullable=False)
+
+    # SHA-256 of the uploaded file bytes (used to deduplicate uploads)
+    content_hash = Column(String(64), nullable=False)
+
+    # Text extracted from the file at upload time
+    text = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class AnalysisJob(Base):
+    """
+    A queued resume analysis, processed by the background worker pool.
+    Clients submit, get a job_id back, then poll for the result.
+    """
+    __tablename__ = "analysis_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Public, unguessable id handed to the client
+    job_id = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True)
+
+    # queued -> running -> succeeded / failed
+    status = Column(String(20), index=True, default="queued", nullable=False)
+
+    job_description = Column(Text, nullable=False)
+
+    # Either a library resume or the raw uploaded file (parsed by the worker)
+    resume_id = Column(Integer, ForeignKey("resumes.id"), nullable=True)
+    resume_filename = Column(String(255), nullable=True)
+    resume_data = Column(LargeBinary, nullable=True)
+
+    # JSON-encoded analysis result (same shape as /upload-resume/)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Set on every claim; only the worker holding the current token may finish the job
+    claim_token = Column(String(32), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ProfileTrendsCache(Base):
+    """
+    Last generated 'Trends for you' list per user, so the dashboard does not
+    need a fresh LLM call on every load. input_hash covers profession, bio
+    and the prompt version; a mismatch means the entry is out of date.
+    """
+    __tablename__ = "profile_trends_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+
+    input_hash = Column(String(64), nullable=False)
+
+    # JSON-encoded list of trend items
+    trends = Column(Text, nullable=False)
+
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ProfessionTrends(Base):
+    """
+    Shared 'Trends for you' list per normalized profession, precomputed in
+    batch (see app/precompute_trends.py) so most dashboard loads need no LLM call.
+    """
+    __tablename__ = "profession_trends"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # normalize_text(profession), e.g. "software engineer"
+    profession_key = Column(String(255), unique=True, index=True, nullable=False)
+    profession = Column(String(255), nullable=False)
+
+    prompt_version = Column(String(20), nullable=False)
+
+    # JSON-encoded list of trend items
+    trends = Column(Text, nullable=False)
+
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
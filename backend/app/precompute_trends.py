@@ -0,0 +1,12 @@
+from app.database import SessionLocal
+from app.main import precompute_profession_trends
+
+# Batch job: fill the shared profession trends catalog.
+# Run periodically (e.g. a daily cron): python -m app.precompute_trends
+db = SessionLocal()
+try:
+    print("Precomputing profession trends...")
+    generated = precompute_profession_trends(db)
+    print(f"Generated trends for {generated} profession(s).")
+finally:
+    db.close()
@@ -0,0 +1,247 @@
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+from app.scoring import bm25_scores
+
+# --- Token-budgeted prompt inputs (job descriptions, resumes, requirement lists) ---
+
+# Resume text sent with each matching / Q&A call is cut down to about this many tokens
+PROMPT_RESUME_TOKEN_BUDGET = int(os.getenv("PROMPT_RESUME_TOKEN_BUDGET", 2500))
+
+# Job description text (after boilerplate removal) is cut down to about this many tokens
+PROMPT_JOB_TOKEN_BUDGET = int(os.getenv("PROMPT_JOB_TOKEN_BUDGET", 2000))
+
+# Tokenizer used for counting (tiktoken, if installed)
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "o200k_base")
+
+# A job-description section is boilerplate when its heading is exactly one of these
+# (compared lowercased, without markdown/bullet marks or a trailing colon)
+_BOILERPLATE_HEADINGS = frozenset([
+    "about us", "about the company", "who we are",
+    "benefits", "perks", "perks and benefits", "benefits and perks", "our benefits",
+    "what we offer", "why join us", "why work with us", "why work here",
+    "compensation", "compensation and benefits", "salary", "salary and benefits",
+    "pay range", "pay transparency",
+    "eeo", "eeo statement", "equal opportunity", "equal employment opportunity",
+    "equal opportunity employer", "diversity and inclusion", "diversity, equity and inclusion",
+    "our commitment to diversity", "accommodations", "reasonable accommodations",
+    "privacy notice", "privacy policy", "disclaimer", "how to apply",
+])
+
+# Lines containing these phrases are boilerplate, but only under a boilerplate heading
+# or in the legal/EEO paragraphs at the end of a posting
+_BOILERPLATE_PHRASE = re.compile(
+    r"equal opportunity employer|without regard to (race|age|sex|gender)|"
+    r"reasonable accommodations?|e-verify|pay transparency|"
+    r"(we|our) (offer|provide)s? (a )?(competitive|comprehensive|generous)|"
+    r"401\(?k\)?|paid time off|dental and vision|medical, dental",
+    re.IGNORECASE,
+)
+
+# Text that states what the candidate needs; never removed as boilerplate
+_REQUIREMENT_CUE = re.compile(
+    r"\b(requir\w*|qualifications?|must|should|experience\w*|years?|degrees?|"
+    r"bachelor\w*|master\w*|ph\.?d|proficien\w*|knowledge|skills?|ability|able to|"
+    r"familiar\w*|certifi\w*|licen[cs]\w*)\b",
+    re.IGNORECASE,
+)
+
+# If cleaning keeps less than this share of the text, the posting was probably about
+# benefits/compensation itself; use it uncleaned instead
+_MIN_KEPT_RATIO = 0.2
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(PROMPT_TOKENIZER)
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, else the ~4 characters/token estimate."""
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapse runs of spaces, strip each line, keep single blank lines between
+    paragraphs, and drop repeated long lines (page headers/footers from PDF extraction).
+    """
+    seen = set()
+    lines = []
+    for raw in (text or "").splitlines():
+        line = re.sub(r"[ \t ]+", " ", raw).strip()
+        if not line:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        key = line.casefold()
+        if len(line) >= 40 and key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+def _is_heading(line: str) -> bool:
+    """Short label line such as "Benefits:", "EXPERIENCE" or "What You'll Do"."""
+    stripped = line.strip()
+    if stripped[:1] in ("-", "*", "•"):
+        # bullet item, not a label
+        return False
+    core = stripped.rstrip(":").lstrip("# ").strip()
+    if not core or len(core) > 60 or core[-1] in ".,;" or "," in core:
+        return False
+    if stripped.endswith(":"):
+        return True
+    if core.isupper() and sum(c.isalpha() for c in core) >= 3:
+        return True
+    words = core.split()
+    return len(words) <= 4 and all(w[0].isupper() or not w[0].isalpha() for w in words)
+
+def split_sections(text: str):
+    """
+    Split normalized text into sections: a heading line plus the lines under it,
+    or a blank-line separated paragraph when there are no headings.
+    """
+    sections, current = [], []
+    for line in text.split("\n"):
+        if not line or (_is_heading(line) and current and not _is_heading(current[-1])):
+            if current:
+                sections.append("\n".join(current))
+            current = [line] if line else []
+        else:
+            current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut `text` to roughly `budget` tokens, at a line boundary where possible."""
+    if count_tokens(text) <= budget:
+        return text
+    encoder = _encoder()
+    if encoder is not None:
+        cut = encoder.decode(encoder.encode(text, disallowed_special=())[:budget])
+    else:
+        cut = text[: budget * 4]
+    newline = cut.rfind("\n")
+    return cut[:newline] if newline > len(cut) // 2 else cut
+
+def _is_boilerplate_heading(line: str) -> bool:
+    core = re.sub(r"\s+", " ", line.strip().lstrip("#*-• ").rstrip(":").strip()).casefold()
+    return core in _BOILERPLATE_HEADINGS
+
+def _strip_phrases(section: str) -> str:
+    """The section without lines that match a boilerplate phrase and have no requirement cue."""
+    lines = section.split("\n")
+    kept = [
+        line for line in lines
+        if not _BOILERPLATE_PHRASE.search(line) or _REQUIREMENT_CUE.search(line)
+    ]
+    if len(lines) > 1 and len(kept) == 1 and _is_heading(kept[0]):
+        # every line under the heading was boilerplate
+        return ""
+    return "\n".join(kept)
+
+def _strip_boilerplate(section: str) -> str:
+    """
+    A section under a boilerplate heading: dropped, or only its boilerplate lines
+    if it also states requirements. Other sections are returned unchanged.
+    """
+    if not _is_boilerplate_heading(section.split("\n", 1)[0]):
+        return section
+    if not _REQUIREMENT_CUE.search(section):
+        return ""
+    return _strip_phrases(section)
+
+def _is_legal_paragraph(section: str) -> bool:
+    """Unheaded paragraph made up mostly of boilerplate phrases (EEO, benefits, legal)."""
+    lines = section.split("\n")
+    if _is_heading(lines[0]):
+        return False
+    matched = sum(1 for line in lines if _BOILERPLATE_PHRASE.search(line))
+    return matched * 2 > len(lines)
+
+def clean_job_text(job_text: str, budget: int = None) -> str:
+    """Job description without EEO/benefits/legal boilerplate, within the token budget."""
+    normalized = normalize_whitespace(job_text)
+    sections = split_sections(normalized)
+    # Legal/EEO paragraphs trailing the posting (never the opening section)
+    tail = len(sections)
+    while tail > 1 and _is_legal_paragraph(sections[tail - 1]):
+        tail -= 1
+    kept = []
+    for i, section in enumerate(sections):
+        section = _strip_phrases(section) if i >= tail else _strip_boilerplate(section)
+        if section:
+            kept.append(section)
+    cleaned = "\n".join(kept)
+    if count_tokens(cleaned) < count_tokens(normalized) * _MIN_KEPT_RATIO:
+        cleaned = normalized
+    return truncate_to_tokens(cleaned, budget or PROMPT_JOB_TOKEN_BUDGET)
+
+def trim_resume(resume_text: str, query: str, budget: int = None) -> str:
+    """
+    Resume text within `budget` tokens. When it doesn't fit, keep the opening
+    section (name/summary) and then the sections most relevant to `query`
+    (e.g. the requirement list) by BM25, in their original order.
+    """
+    budget = budget or PROMPT_RESUME_TOKEN_BUDGET
+    text = normalize_whitespace(resume_text)
+    if count_tokens(text) <= budget:
+        return text
+
+    sections = split_sections(text)
+    sizes = [count_tokens(s) for s in sections]
+    relevance = bm25_scores(query, sections) if len(sections) > 1 else [1.0]
+    ranked = [0] + sorted(range(1, len(sections)), key=lambda i: -relevance[i])
+
+    chosen, used = set(), 0
+    for i in ranked:
+        if used + sizes[i] <= budget:
+            chosen.add(i)
+            used += sizes[i]
+    if not chosen:
+        return truncate_to_tokens(text, budget)
+    return "\n".join(sections[i] for i in sorted(chosen))
+
+def compact_requirements(requirements) -> str:
+    """Requirement list as compact JSON (no indentation), duplicates removed."""
+    seen = set()
+    items = []
+    for r in requirements:
+        title = (r.get("requirement") or "").strip()
+        if not title or title.casefold() in seen:
+            continue
+        seen.add(title.casefold())
+        items.append({"requirement": title, "explanation": (r.get("explanation") or "").strip()})
+    return json.dumps(items, separators=(",", ":"), ensure_ascii=False)
+
+def record_savings(purpose: str, original_tokens: int, prompt_tokens: int):
+    """Track how many tokens budgeting removed from each kind of call."""
+    with _stats_lock:
+        s = _stats.setdefault(purpose, {"calls": 0, "original_tokens": 0, "prompt_tokens": 0})
+        s["calls"] += 1
+        s["original_tokens"] += original_tokens
+        s["prompt_tokens"] += prompt_tokens
+
+def prompt_metrics() -> dict:
+    """Per-purpose totals of tokens before/after budgeting and tokens saved."""
+    with _stats_lock:
+        snapshot = {purpose: dict(s) for purpose, s in _stats.items()}
+    for s in snapshot.values():
+        s["tokens_saved"] = s["original_tokens"] - s["prompt_tokens"]
+    return snapshot
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models import UserSession
+
+# --- In-memory set of recently revoked session ids ---
+#
+# Access tokens are short-lived and validated without a DB query, so the only
+# thing that can invalidate one early is its sid showing up here. A sid only
+# needs to stay in the set for one access-token lifetime after revocation.
+# Revocations made by this process are added immediately; revocations made by
+# other processes are picked up from user_sessions every REVOCATION_REFRESH_SECONDS.
+
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", 15))
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", 10))
+
+_revoked = {}  # sid -> time.monotonic() after which the entry can be dropped
+_lock = threading.Lock()
+_refresh_task = None
+
+
+def _retention_seconds():
+    # One access-token lifetime plus a little clock slack
+    return ACCESS_TOKEN_MINUTES * 60 + 60
+
+def revoke(*sids):
+    """Mark session ids as revoked in this process."""
+    until = time.monotonic() + _retention_seconds()
+    with _lock:
+        for sid in sids:
+            if sid:
+                _revoked[sid] = until
+
+def is_revoked(sid) -> bool:
+    with _lock:
+        until = _revoked.get(sid)
+        if until is None:
+            return False
+        if until < time.monotonic():
+            del _revoked[sid]
+            return False
+        return True
+
+def load_recent_revocations():
+    """Merge sessions revoked (by any process) within the last token lifetime into the set."""
+    cutoff = datetime.utcnow() - timedelta(seconds=_retention_seconds())
+    db = SessionLocal()
+    try:
+        sids = [
+            sid for (sid,) in db.query(UserSession.session_id).filter(
+                UserSession.revoked == True,
+                UserSession.revoked_at >= cutoff,
+            )
+        ]
+    finally:
+        db.close()
+
+    revoke(*sids)
+    now = time.monotonic()
+    with _lock:
+        for sid in [s for s, until in _revoked.items() if until < now]:
+            del _revoked[sid]
+
+async def _refresh_loop():
+    while True:
+        try:
+            await asyncio.to_thread(load_recent_revocations)
+        except Exception as e:
+            print("Revocation refresh failed:", e)
+        await asyncio.sleep(REVOCATION_REFRESH_SECONDS)
+
+def start_refresh():
+    """Start the periodic DB refresh on the running event loop."""
+    global _refresh_task
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop_refresh():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
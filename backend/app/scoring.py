@@ -0,0 +1,114 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+from scipy import sparse
+
+# --- Lexical scoring engine (BM25 over sparse term matrices) ---
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# IDF is only meaningful across a pool of documents; below this size all terms weigh the same
+BM25_MIN_DOCS_FOR_IDF = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+etc few for from further had has have having he her here hers herself him himself his
+how i if in into is it its itself just may me might more most must my myself no nor
+not now of off on once only or other our ours ourselves out over own per plus same
+she should so some such than that the their theirs them themselves then there these
+they this those through to too under until up upon us very via was we were what when
+where which while who whom why will with within without would you your yours yourself
+yourselves ability able candidate candidates experience including etc work working
+role team job position responsibilities requirements required preferred strong
+""".split())
+
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ings", "ing", "ies", "ers", "er", "ed", "es", "ly", "s")
+
+
+@lru_cache(maxsize=50_000)
+def stem(word: str) -> str:
+    """Light suffix-stripping stemmer (keeps short words and tech terms intact)."""
+    if len(word) <= 4 or not word.isalpha():
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "ies":
+                return word[:-3] + "y"
+            return word[: -len(suffix)]
+    return word
+
+@lru_cache(maxsize=2048)
+def tokenize(text: str) -> tuple:
+    """Lowercase, drop stopwords and stem. Cached, so repeated texts are free."""
+    return tuple(
+        stem(tok) for tok in _TOKEN_RE.findall((text or "").lower())
+        if tok not in STOPWORDS
+    )
+
+def _query_term_matrix(query_terms, docs):
+    """
+    Sparse (docs x query terms) term-frequency matrix plus each doc's length.
+    Only query columns are materialized; other tokens just count toward length.
+    """
+    column = {term: j for j, term in enumerate(query_terms)}
+    rows, cols, lengths = [], [], np.zeros(len(docs), dtype=np.float64)
+    for i, doc in enumerate(docs):
+        tokens = tokenize(doc)
+        lengths[i] = len(tokens)
+        for tok in tokens:
+            j = column.get(tok)
+            if j is not None:
+                rows.append(i)
+                cols.append(j)
+    tf = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(docs), len(query_terms)),
+    )
+    tf.sum_duplicates()
+    return tf, lengths
+
+def bm25_scores(query: str, docs, normalize: bool = True) -> np.ndarray:
+    """
+    BM25 score of `query` against every document in `docs` in one sparse matrix op.
+
+    With normalize=True, scores are scaled to 0..1, where 1.0 means the document
+    scores at least as well as an average-length document containing every query
+    term once, so results are comparable across queries.
+    """
+    docs = list(docs)
+    if not docs:
+        return np.zeros(0)
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not query_terms:
+        return np.zeros(len(docs))
+
+    tf, lengths = _query_term_matrix(query_terms, docs)
+    avg_len = lengths.mean() or 1.0
+
+    # IDF over the scored documents themselves
+    n_docs = len(docs)
+    if n_docs >= BM25_MIN_DOCS_FOR_IDF:
+        doc_freq = np.diff(tf.tocsc().indptr)
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    else:
+        idf = np.ones(len(query_terms))
+
+    # Saturate term frequencies in place on the sparse data
+    row_of_entry = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[row_of_entry] / avg_len)
+    tf.data = tf.data * (BM25_K1 + 1) / (tf.data + norm)
+
+    scores = np.asarray(tf @ idf).ravel()
+    if normalize:
+        scores = np.minimum(scores / idf.sum(), 1.0)
+    return scores
+
+def term_coverage(query: str, text: str) -> bool:
+    """True if every normalized term of `query` appears in `text`."""
+    query_terms = set(tokenize(query))
+    return bool(query_terms) and query_terms <= set(tokenize(text))
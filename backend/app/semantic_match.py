@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+
+from app.cache_utils import TTLCache, content_hash
+
+# --- Local sentence-embedding matcher (CPU, transformers/torch) ---
+
+SEMANTIC_MATCH_ENABLED = os.getenv("SEMANTIC_MATCH_ENABLED", "False") == "True"
+SEMANTIC_MODEL_NAME = os.getenv("SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_BATCH_SIZE = int(os.getenv("SEMANTIC_BATCH_SIZE", 32))
+
+# Cosine similarity at/above which a requirement counts as clearly met without asking the LLM
+SEMANTIC_MET_THRESHOLD = float(os.getenv("SEMANTIC_MET_THRESHOLD", 0.8))
+
+_model = None
+_tokenizer = None
+_load_failed = False
+_load_lock = threading.Lock()
+
+# Resume sentence embeddings keyed by resume text hash; requirement embeddings by text
+_resume_embeddings = TTLCache(maxsize=256, ttl=6 * 3600)
+_requirement_embeddings = TTLCache(maxsize=4096, ttl=24 * 3600)
+
+
+def _load_model():
+    """
+    Load the tokenizer/model on first use. Returns False if semantic matching is
+    disabled or torch/transformers are not available, so callers can skip it.
+    """
+    global _model, _tokenizer, _load_failed
+    if not SEMANTIC_MATCH_ENABLED or _load_failed:
+        return False
+    if _model is not None:
+        return True
+    with _load_lock:
+        if _model is None and not _load_failed:
+            try:
+                import torch  # noqa: F401
+                from transformers import AutoModel, AutoTokenizer
+
+                _tokenizer = AutoTokenizer.from_pretrained(SEMANTIC_MODEL_NAME)
+                _model = AutoModel.from_pretrained(SEMANTIC_MODEL_NAME)
+                _model.eval()
+            except Exception as e:
+                print("Semantic matcher unavailable:", e)
+                _load_failed = True
+    return _model is not None
+
+def is_available() -> bool:
+    """True if the embedding model is enabled and loads successfully."""
+    return _load_model()
+
+def split_sentences(text: str):
+    """Split resume text into short, non-empty sentences/lines worth embedding."""
+    pieces = re.split(r"(?<=[.!?;])\s+|\n+|\s*[•·▪]\s*", text or "")
+    return [p.strip() for p in pieces if len(p.strip()) > 3]
+
+def embed(texts):
+    """Return L2-normalized embeddings (a torch tensor) for `texts`, batched."""
+    import torch
+
+    chunks = []
+    with torch.no_grad():
+        for start in range(0, len(texts), SEMANTIC_BATCH_SIZE):
+            batch = texts[start:start + SEMANTIC_BATCH_SIZE]
+            encoded = _tokenizer(
+                batch, padding=True, truncation=True, max_length=128, return_tensors="pt"
+            )
+            output = _model(**encoded).last_hidden_state
+            # Mean pooling over real (non-padding) tokens
+            mask = encoded["attention_mask"].unsqueeze(-1).float()
+            pooled = (output * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            chunks.append(torch.nn.functional.normalize(pooled, dim=1))
+    return torch.cat(chunks) if chunks else torch.empty(0)
+
+def _resume_sentence_embeddings(resume_text):
+    key = content_hash(resume_text)
+    cached = _resume_embeddings.get(key)
+    if cached is None:
+        sentences = split_sentences(resume_text)
+        cached = (sentences, embed(sentences) if sentences else None)
+        _resume_embeddings.set(key, cached)
+    return cached
+
+def _requirement_matrix(texts):
+    import torch
+
+    missing = [t for t in dict.fromkeys(texts) if _requirement_embeddings.get(t) is None]
+    if missing:
+        for text, vector in zip(missing, embed(missing)):
+            _requirement_embeddings.set(text, vector)
+    return torch.stack([_requirement_embeddings.get(t) for t in texts])
+
+def score_requirements(resume_text, requirements):
+    """
+    For each requirement, find the most similar resume sentence.
+    Returns [{"requirement", "similarity", "evidence"}] or None if the model is unavailable.
+    """
+    if not requirements or not _load_model():
+        return None
+
+    sentences, sentence_vectors = _resume_sentence_embeddings(resume_text)
+    texts = [
+        f"{r.get('requirement', '')}. {r.get('explanation', '')}".strip()
+        for r in requirements
+    ]
+    if sentence_vectors is None:
+        return [
+            {"requirement": r.get("requirement"), "similarity": 0.0, "evidence": ""}
+            for r in requirements
+        ]
+
+    similarities = _requirement_matrix(texts) @ sentence_vectors.T
+    best_scores, best_index = similarities.max(dim=1)
+    return [
+        {
+            "requirement": r.get("requirement"),
+            "similarity": float(score),
+            "evidence": sentences[int(idx)],
+        }
+        for r, score, idx in zip(requirements, best_scores, best_index)
+    ]
+
+def semantic_match_score(resume_text, requirements):
+    """Mean best-sentence similarity across requirements (0..1), or None if unavailable."""
+    scored = score_requirements(resume_text, requirements)
+    if not scored:
+        return None
+    return max(0.0, sum(s["similarity"] for s in scored) / len(scored))
+
+def semantic_verdicts(resume_text, requirements, threshold=SEMANTIC_MET_THRESHOLD):
+    """
+    Match results in the same shape as match_requirements_gpt, decided locally.
+    Returns None if the model is unavailable.
+    """
+    scored = score_requirements(resume_text, requirements)
+    if scored is None:
+        return None
+    verdicts = []
+    for s in scored:
+        met = s["similarity"] >= threshold
+        verdicts.append({
+            "requirement": s["requirement"],
+            "met": met,
+            "explanation": (
+                f"Resume mentions: \"{s['evidence']}\"" if met
+                else "No clearly matching experience found in the resume"
+            ),
+        })
+    return verdicts
+
+def split_confident(resume_text, requirements, threshold=SEMANTIC_MET_THRESHOLD):
+    """
+    Pre-decide requirements that are obviously met.
+    Returns (met_results, remaining_requirements); remaining still need the LLM.
+    """
+    verdicts = semantic_verdicts(resume_text, requirements, threshold)
+    if verdicts is None:
+        return [], list(requirements)
+    met_results, remaining = [], []
+    for req, verdict in zip(requirements, verdicts):
+        if verdict["met"]:
+            met_results.append(verdict)
+        else:
+            remaining.append(req)
+    return met_results, remaining
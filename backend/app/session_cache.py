@@ -0,0 +1,79 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.cache_utils import TTLCache
+from app.models import User, LoginEvent
+
+# --- Short-lived in-process cache for get_current_user ---
+#
+# sid -> {"user_id", "username", "active"}   (session validity)
+# user_id -> dict of User column values      (user snapshot)
+#
+# Entries are dropped explicitly on logout / account changes and automatically
+# whenever a User or LoginEvent row is modified through the ORM. Other server
+# processes only see a revocation once their entry expires, so keep the TTL short.
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10_000))
+
+_sessions = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_users = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+_USER_COLUMNS = [c.key for c in User.__table__.columns]
+
+
+def get_session(sid):
+    """Cached session info for a sid, or None."""
+    return _sessions.get(sid)
+
+def remember_user(user):
+    """Cache a snapshot of the user's columns."""
+    _users.set(user.id, {key: getattr(user, key) for key in _USER_COLUMNS})
+
+def remember_session(sid, user, active):
+    """Cache the session state and a snapshot of its user."""
+    _sessions.set(sid, {"user_id": user.id, "username": user.username, "active": bool(active)})
+    remember_user(user)
+
+def cached_user(user_id):
+    """
+    Rebuild the cached User as a detached instance (no session, no SELECT).
+    Fine for reading; async endpoints re-fetch with db.get() before modifying it.
+    Returns None on a miss.
+    """
+    values = _users.get(user_id)
+    if values is None:
+        return None
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+def attach_cached_user(db, user_id):
+    """
+    Rebuild the cached User and attach it to `db` without a SELECT,
+    so endpoints can read and modify it as usual. Returns None on a miss.
+    """
+    user = cached_user(user_id)
+    if user is None:
+        return None
+    return db.merge(user, load=False)
+
+def invalidate_session(sid):
+    _sessions.pop(sid)
+
+def invalidate_user(user_id):
+    """Drop the user snapshot and every cached session belonging to the user."""
+    _users.pop(user_id)
+    _sessions.pop_matching(lambda sid, info: info["user_id"] == user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_change(session, flush_context):
+    """Any ORM write to a User or LoginEvent row evicts the matching cache entries."""
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            invalidate_user(obj.id)
+        elif isinstance(obj, LoginEvent) and obj.session_id:
+            invalidate_session(obj.session_id)
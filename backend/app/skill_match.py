@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import threading
+from collections import deque
+
+from app.cache_utils import TTLCache, content_hash
+
+# --- Local skill/certification matcher (taxonomy phrases, no model) ---
+#
+# Requirements that are just a skill or tool name ("Python", "Experience with AWS
+# or GCP", "PMP certification") are decided here by looking the taxonomy phrases
+# up in the resume. Aliases map to one canonical name, so "k8s" on the resume
+# satisfies "Kubernetes". Anything with more to it ("3+ years of Python",
+# "Bachelor's degree") is left for the LLM, as is any skill the resume doesn't name.
+
+SKILL_MATCH_ENABLED = os.getenv("SKILL_MATCH_ENABLED", "True") == "True"
+SKILL_TAXONOMY_PATH = os.getenv(
+    "SKILL_TAXONOMY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_taxonomy.json"),
+)
+
+# Words that may surround skill names in a requirement without changing what is asked
+_FILLER = frozenset("""
+    a an the and or with in of on for to as is are be must have has
+    experience experienced proficiency proficient knowledge familiarity familiar
+    understanding hands ability use using
+    skill skills tool tools framework frameworks language languages programming
+    platform platforms technology technologies development database databases cloud
+    pipeline pipelines
+    such like including e.g etc plus preferred required
+    certification certifications certified certificate valid current
+""".split())
+
+# Connectors after which any one of the listed skills is enough
+_ANY_OF = frozenset(["or", "such", "like", "including", "e.g"])
+
+# An extraction explanation with any of these adds a constraint the title doesn't show
+# ("5+ years", "senior level", "degree in CS"), so the LLM has to judge it
+_CONSTRAINT_CUE = re.compile(
+    r"\d|\b(years?|senior|junior|mid|expert\w*|advanced|intermediate|proficien\w*|"
+    r"fluen\w*|strong|deep|extensive|solid|lead\w*|degrees?|bachelor\w*|master\w*|"
+    r"ph\.?d|diploma|minimum|at least)\b",
+    re.IGNORECASE,
+)
+
+# Tokens keep "c++", "c#", ".net", "node.js" intact; "/" and "-" split ("ci/cd" -> ci, cd)
+_TOKEN = re.compile(r"\.?[a-z0-9]+(?:\.[a-z0-9]+)*[+#]*")
+
+_index = None
+_load_failed = False
+_load_lock = threading.Lock()
+
+# Canonical skills found in each resume, keyed by resume text hash
+_resume_skills = TTLCache(maxsize=256, ttl=6 * 3600)
+
+
+def tokenize(text: str):
+    return _TOKEN.findall((text or "").casefold())
+
+
+class PhraseIndex:
+    """
+    Aho-Corasick automaton over token sequences: finds every occurrence of every
+    phrase in one pass over the text, regardless of how many phrases there are.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+    def add(self, tokens, value):
+        node = 0
+        for token in tokens:
+            child = self._goto[node].get(token)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][token] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((len(tokens), value))
+
+    def build(self):
+        """Compute failure links (breadth-first); call once after the last add()."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, tokens):
+        """Yield (start, end, value) for every phrase occurrence in `tokens`."""
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for length, value in self._out[node]:
+                yield i - length + 1, i + 1, value
+
+
+def build_index(taxonomy):
+    """
+    Index every canonical name and alias in `taxonomy`. Values are
+    (canonical, counts_as_evidence): names listed under "title_only" are everyday
+    words ("Go", "Excel") recognized in requirements but not trusted on a resume.
+    """
+    title_only = set(taxonomy.get("title_only", []))
+    index = PhraseIndex()
+    seen = set()
+    for group in taxonomy["skills"].values():
+        for canonical, aliases in group.items():
+            phrases = [(canonical, canonical not in title_only)]
+            phrases += [(alias, True) for alias in aliases]
+            for phrase, evidence in phrases:
+                tokens = tuple(tokenize(phrase))
+                if tokens and tokens not in seen:
+                    seen.add(tokens)
+                    index.add(tokens, (canonical, evidence))
+    index.build()
+    return index
+
+def load_index():
+    """
+    Build the shared index from SKILL_TAXONOMY_PATH on first use (startup calls it
+    once). Returns None if the matcher is disabled or the taxonomy can't be loaded.
+    """
+    global _index, _load_failed
+    if not SKILL_MATCH_ENABLED or _load_failed:
+        return None
+    if _index is not None:
+        return _index
+    with _load_lock:
+        if _index is None and not _load_failed:
+            try:
+                with open(SKILL_TAXONOMY_PATH, encoding="utf-8") as f:
+                    _index = build_index(json.load(f))
+            except Exception as e:
+                print("Skill taxonomy unavailable:", e)
+                _load_failed = True
+    return _index
+
+def resume_skills(resume_text):
+    """Canonical skills the resume names (by canonical name or any trusted alias)."""
+    key = content_hash(resume_text)
+    cached = _resume_skills.get(key)
+    if cached is None:
+        cached = frozenset(
+            canonical
+            for _, _, (canonical, evidence) in load_index().find(tokenize(resume_text))
+            if evidence
+        )
+        _resume_skills.set(key, cached)
+    return cached
+
+def requirement_skills(requirement):
+    """
+    If the requirement is only skill names plus filler words, return
+    (canonical skills, any_of); otherwise None. Overlapping phrases resolve to the
+    leftmost-longest one, so "React Native" is one skill, not React + React Native.
+    Mixed connectors ("Python or Java and AWS") return None rather than guess the grouping.
+    """
+    tokens = tokenize(requirement)
+    spans = sorted(load_index().find(tokens), key=lambda s: (s[0], -(s[1] - s[0])))
+    skills, covered, end = [], set(), 0
+    for start, stop, (canonical, _) in spans:
+        if start < end:
+            continue
+        skills.append(canonical)
+        covered.update(range(start, stop))
+        end = stop
+    if not skills:
+        return None
+    leftover = [t for i, t in enumerate(tokens) if i not in covered]
+    if any(t not in _FILLER for t in leftover):
+        return None
+    any_of = any(t in _ANY_OF for t in leftover)
+    if any_of and "and" in leftover:
+        return None
+    return list(dict.fromkeys(skills)), any_of
+
+def split_present(resume_text, requirements):
+    """
+    Pre-decide plain skill requirements the resume clearly names. Requirements whose
+    explanation adds a constraint (years, level, degree) are left alone.
+    Returns (met_results, remaining_requirements); remaining still need the LLM.
+    """
+    if not requirements or load_index() is None:
+        return [], list(requirements)
+    present = resume_skills(resume_text)
+    met_results, remaining = [], []
+    for req in requirements:
+        parsed = None
+        if not _CONSTRAINT_CUE.search(req.get("explanation") or ""):
+            parsed = requirement_skills(req.get("requirement") or "")
+        if parsed is not None:
+            skills, any_of = parsed
+            found = [s for s in skills if s in present]
+            if found and (any_of or len(found) == len(skills)):
+                met_results.append({
+                    "requirement": req.get("requirement"),
+                    "met": True,
+                    "explanation": f"Resume lists {', '.join(found)}",
+                })
+                continue
+        remaining.append(req)
+    return met_results, remaining
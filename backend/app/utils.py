@@ -1,30 +1,3 @@
-from passlib.context import CryptContext
-
-# Initialize a password hashing context using bcrypt as the hashing algorithm.
-# The 'deprecated="auto"' ensures compatibility with older hashes if needed.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    """
-    Hashes a plain text password using bcrypt.
-
-    Args:
-        password (str): The plain text password to hash.
-
-    Returns:
-        str: The hashed password.
-    """
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password) -> bool:
-    """
-    Verifies a plain text password against a hashed password.
-
-    Args:
-        plain_password (str): The plain text password to verify.
-        hashed_password (str): The hashed password to compare against.
-
-    Returns:
-        bool: True if the password matches, False otherwise.
-    """
-    return pwd_context.verify(plain_password, hashed_password)
+# Password hashing lives in app.auth (one bcrypt implementation, run on a bounded
+# thread pool). These names are kept so existing imports keep working.
+from app.auth import hash_password, verify_password  # noqa: F401
@@ -46,6 +46,7 @@ const App = () => {
   const handleLogin = (data) => {
     setAuthData({
       token: data.access_token,
+      refreshToken: data.refresh_token,
       email: data.email,
       username: data.username,
     });
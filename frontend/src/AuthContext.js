@@ -31,27 +31,60 @@ function isTokenExpired(token) {
 function getStoredAuth() {
     // Try sessionStorage first
     let token = sessionStorage.getItem("token");
+    let refreshToken = sessionStorage.getItem("refresh_token");
     let email = sessionStorage.getItem("email");
     let username = sessionStorage.getItem("username");
     // If not found in sessionStorage, try localStorage
     if (!token || !email || !username) {
         token = localStorage.getItem("token");
+        refreshToken = localStorage.getItem("refresh_token");
         email = localStorage.getItem("email");
         username = localStorage.getItem("username");
     }
 
-    // NEW: If we have something in storage but the token is expired, clear it and return null.
-    if (token && isTokenExpired(token)) {
-        sessionStorage.removeItem("token");
-        sessionStorage.removeItem("email");
-        sessionStorage.removeItem("username");
-        localStorage.removeItem("token");
-        localStorage.removeItem("email");
-        localStorage.removeItem("username");
+    // NEW: If the access token is expired and there is no usable refresh token, clear it and return null.
+    // (An expired access token with a valid refresh token is renewed on the first 401.)
+    if (token && isTokenExpired(token) && isTokenExpired(refreshToken)) {
+        clearStoredAuth();
         return null;
     }
 
-    return token && email && username ? { token, email, username } : null;
+    return token && email && username ? { token, refreshToken, email, username } : null;
+}
+
+// Helper to remove all auth data from both storages.
+function clearStoredAuth() {
+    for (const storage of [localStorage, sessionStorage]) {
+        storage.removeItem("token");
+        storage.removeItem("refresh_token");
+        storage.removeItem("email");
+        storage.removeItem("username");
+    }
+}
+
+// Helper to save a renewed access token next to the refresh token it came from.
+function storeAccessToken(token) {
+    const storage = sessionStorage.getItem("refresh_token") ? sessionStorage : localStorage;
+    storage.setItem("token", token);
+}
+
+// Shared in-flight refresh, so several requests failing at once trigger a single /token/refresh/ call.
+let refreshPromise = null;
+
+function refreshAccessToken() {
+    const refreshToken = sessionStorage.getItem("refresh_token") || localStorage.getItem("refresh_token");
+    if (!refreshToken || isTokenExpired(refreshToken)) {
+        return Promise.reject(new Error("No refresh token"));
+    }
+    if (!refreshPromise) {
+        refreshPromise = axios
+            .post(`${BASE_URL}/token/refresh/`, { refresh_token: refreshToken })
+            .then((res) => res.data.access_token)
+            .finally(() => {
+                refreshPromise = null;
+            });
+    }
+    return refreshPromise;
 }
 
 // AuthProvider component to wrap the application and provide authentication context.
@@ -70,13 +103,29 @@ export function AuthProvider({ children }) {
     }, [user]);
 
     // NEW: Global axios response interceptor.
-    // If the backend returns 401 (token expired / invalid), we log the user out
+    // Access tokens are short-lived: on a 401 we first try to renew the token with the
+    // refresh token and replay the request. Only if that fails do we log the user out
     // and send them back to the login page.
     useEffect(() => {
         const interceptor = axios.interceptors.response.use(
             (response) => response,
-            (error) => {
-                if (error?.response?.status === 401) {
+            async (error) => {
+                const original = error?.config;
+                const isRefreshCall = original?.url?.includes("/token/refresh/");
+                if (error?.response?.status === 401 && original && !original._retried && !isRefreshCall) {
+                    original._retried = true;
+                    try {
+                        const token = await refreshAccessToken();
+                        storeAccessToken(token);
+                        setUser((prev) => (prev ? { ...prev, token } : prev));
+                        axios.defaults.headers.common["Authorization"] = `Bearer ${token}`;
+                        original.headers = { ...original.headers, Authorization: `Bearer ${token}` };
+                        return axios(original);
+                    } catch (refreshError) {
+                        // fall through to logout below
+                    }
+                }
+                if (error?.response?.status === 401 && !isRefreshCall) {
                     logout();
                     // Hard redirect so all state is reset.
                     window.location.href = "/";
@@ -89,7 +138,7 @@ export function AuthProvider({ children }) {
     }, []);
 
     // Function to set authentication data and update the appropriate storage based on "remember me".
-    const setAuthData = ({ token, email, username }, remember = false) => {
+    const setAuthData = ({ token, refreshToken, email, username }, remember = false) => {
         // NEW: If the token is already expired when we receive it (shouldn't happen, but just in case),
         // immediately log out and do not store anything.
         if (isTokenExpired(token)) {
@@ -97,24 +146,14 @@ export function AuthProvider({ children }) {
             return;
         }
 
-        if (remember) {
-            // Save the JWT token, email, and username to localStorage.
-            localStorage.setItem("token", token);
-            localStorage.setItem("email", email);
-            localStorage.setItem("username", username);
-            sessionStorage.removeItem("token");
-            sessionStorage.removeItem("email");
-            sessionStorage.removeItem("username");
-        } else {
-            // Save the JWT token, email, and username to sessionStorage.
-            sessionStorage.setItem("token", token);
-            sessionStorage.setItem("email", email);
-            sessionStorage.setItem("username", username);
-            localStorage.removeItem("token");
-            localStorage.removeItem("email");
-            localStorage.removeItem("username");
-        }
-        setUser({ token, email, username }); // Update the user state with the new data.
+        // Save the JWT tokens, email, and username to localStorage ("remember me") or sessionStorage.
+        clearStoredAuth();
+        const storage = remember ? localStorage : sessionStorage;
+        storage.setItem("token", token);
+        if (refreshToken) storage.setItem("refresh_token", refreshToken);
+        storage.setItem("email", email);
+        storage.setItem("username", username);
+        setUser({ token, refreshToken, email, username }); // Update the user state with the new data.
     };
 
     // Function to perform the login API call and set authentication data on success.
@@ -133,6 +172,7 @@ export function AuthProvider({ children }) {
         setAuthData(
             {
                 token: res.data.access_token,
+                refreshToken: res.data.refresh_token,
                 email: res.data.email,
                 username: res.data.username,
             },
@@ -143,12 +183,7 @@ export function AuthProvider({ children }) {
 
     // Function to log out the user by clearing authentication data from both storages and state.
     const logout = () => {
-        localStorage.removeItem("token"); // Remove the JWT token from localStorage.
-        localStorage.removeItem("email"); // Remove the user's email from localStorage.
-        localStorage.removeItem("username"); // Remove the user's username from localStorage.
-        sessionStorage.removeItem("token"); // Remove the JWT token from sessionStorage.
-        sessionStorage.removeItem("email"); // Remove the user's email from sessionStorage.
-        sessionStorage.removeItem("username"); // Remove the user's username from sessionStorage.
+        clearStoredAuth(); // Remove the JWT tokens, email, and username from both storages.
         setUser(null); // Reset the user state to null.
     };
 
@@ -652,6 +652,8 @@ function Security() {
 
   // Login activity state
   const [loginEvents, setLoginEvents] = useState([]);
+  const [loginsCursor, setLoginsCursor] = useState(null); // next page of login activity, if any
+  const [loadingMoreLogins, setLoadingMoreLogins] = useState(false);
   const [loadingLogins, setLoadingLogins] = useState(true);
   const [loginsError, setLoginsError] = useState("");
 
@@ -710,9 +712,14 @@ function Security() {
     return "Unknown browser";
   };
 
-  // Fetch recent login activity (also capture currentSessionId)
-  const fetchLogins = async () => {
-    setLoadingLogins(true);
+  // Fetch recent login activity (also capture currentSessionId).
+  // The API is paginated: pass a cursor to append the next page.
+  const fetchLogins = async (cursor = null) => {
+    if (cursor) {
+      setLoadingMoreLogins(true);
+    } else {
+      setLoadingLogins(true);
+    }
     setLoginsError("");
 
     try {
@@ -721,14 +728,15 @@ function Security() {
 
       const res = await axios.get(`${BASE_URL}/account/login-activity/`, {
         headers: { Authorization: `Bearer ${token}` },
+        params: cursor ? { cursor } : {},
       });
 
       const events = res.data?.events || [];
-      setLoginEvents(events);
+      setLoginEvents((prev) => (cursor ? [...prev, ...events] : events));
+      setLoginsCursor(res.data?.next_cursor || null);
 
-      const currentRow = events.find((ev) => ev.current_session);
-      if (currentRow && currentRow.session_id) {
-        setCurrentSessionId(currentRow.session_id);
+      if (res.data?.current_session_id) {
+        setCurrentSessionId(res.data.current_session_id);
       }
     } catch (err) {
       console.error("Failed to load login activity", err);
@@ -737,6 +745,7 @@ function Security() {
       );
     } finally {
       setLoadingLogins(false);
+      setLoadingMoreLogins(false);
     }
   };
 
@@ -1073,6 +1082,18 @@ function Security() {
                 })}
               </tbody>
             </table>
+            {loginsCursor && (
+              <div className="mt-3 flex justify-center">
+                <button
+                  type="button"
+                  onClick={() => fetchLogins(loginsCursor)}
+                  disabled={loadingMoreLogins}
+                  className="px-4 py-2 rounded-md border border-gray-300 dark:border-gray-700 text-gray-700 dark:text-gray-200 text-sm font-semibold hover:bg-gray-50 dark:hover:bg-gray-800 disabled:opacity-50"
+                >
+                  {loadingMoreLogins ? "Loading…" : "Show more"}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </section>
@@ -112,6 +112,64 @@ const ResumeMatcher = () => {
     setUserMissing([]);              // Reset user overrides for "missing" requirements.
   };
 
+  // === Apply one streamed analysis event to the partial result ===
+  const applyStreamEvent = (partial, name, data) => {
+    if (name === "requirement") {
+      const met = data.met ? [...partial.met_requirements, data.requirement] : partial.met_requirements;
+      const missing = data.met ? partial.missing_requirements : [...partial.missing_requirements, data.requirement];
+      return {
+        ...partial,
+        met_requirements: met,
+        missing_requirements: missing,
+        requirement_explanations: {
+          ...partial.requirement_explanations,
+          [data.requirement]: data.explanation,
+        },
+      };
+    }
+    if (name === "suggestions") return { ...partial, ai_suggestions: data.ai_suggestions };
+    if (name === "done") return data;
+    return partial;
+  };
+
+  // === Stream the analysis (Server-Sent Events) so results appear stage by stage ===
+  const streamAnalysis = async (formData) => {
+    const res = await fetch(`${BASE_URL}/upload-resume/stream/`, {
+      method: "POST",
+      body: formData,
+    });
+    if (!res.ok || !res.body) throw new Error("Streaming unavailable");
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let partial = {
+      scores: [],
+      met_requirements: [],
+      missing_requirements: [],
+      requirement_explanations: {},
+      ai_suggestions: [],
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line; keep any incomplete tail for the next chunk.
+      const rawEvents = buffer.split("\n\n");
+      buffer = rawEvents.pop();
+      for (const raw of rawEvents) {
+        const lines = raw.split("\n");
+        const eventLine = lines.find(l => l.startsWith("event: "));
+        const dataLine = lines.find(l => l.startsWith("data: "));
+        if (!eventLine || !dataLine) continue;
+        partial = applyStreamEvent(partial, eventLine.slice(7), JSON.parse(dataLine.slice(6)));
+        setResult(partial);
+      }
+    }
+  };
+
   // === Main form submit handler ===
   const handleSubmit = async (e) => {
     e.preventDefault(); // Prevent the default form submission behavior.
@@ -120,21 +178,26 @@ const ResumeMatcher = () => {
       return;
     }
     setLoading(true); // Set loading state to true while processing the request.
+    setUserMet([]);      // Reset user overrides for "met" requirements.
+    setUserMissing([]);  // Reset user overrides for "missing" requirements.
     const formData = new FormData();
     formData.append("resume", resumeFile); // Append the resume file to the form data.
     formData.append("job_description", jobDesc); // Append the job description to the form data.
 
     try {
-      // Send the form data to the backend for processing.
-      const res = await axios.post(`${BASE_URL}/upload-resume/`, formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-      });
-      setResult(res.data); // Update the result state with the backend response.
-      setUserMet([]);      // Reset user overrides for "met" requirements.
-      setUserMissing([]);  // Reset user overrides for "missing" requirements.
-    } catch (err) {
-      // Handle errors during the request.
-      setResult({ error: "There was a problem processing your request." });
+      // Prefer the streaming endpoint so requirements show up as soon as they are ready.
+      await streamAnalysis(formData);
+    } catch (streamErr) {
+      try {
+        // Fall back to the one-shot endpoint.
+        const res = await axios.post(`${BASE_URL}/upload-resume/`, formData, {
+          headers: { "Content-Type": "multipart/form-data" },
+        });
+        setResult(res.data); // Update the result state with the backend response.
+      } catch (err) {
+        // Handle errors during the request.
+        setResult({ error: "There was a problem processing your request." });
+      }
     } finally {
       setLoading(false); // Reset the loading state.
     }